@@ -7,6 +7,24 @@ Sistema Olivion - Preparar banco para nova instalação
 import sqlite3
 import os
 from datetime import datetime
+from urllib.request import pathname2url
+
+def _connect(path):
+    """Abrir conexão SQLite via URI em autocommit com cache de páginas de 20MB"""
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}", uri=True,
+                           check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA cache_size=-20000")
+    return conn
+
+# (passo exibido, tabela, filtro do DELETE, mensagem de sucesso) na ordem da limpeza
+LIMPEZA = [
+    ("Removendo licenças antigas...", 'system_license', "", "Licenças removidas"),
+    ("Verificando chamados de teste...", 'chamado', "", "Chamados removidos"),
+    ("Removendo logs antigos...", 'audit_log', "", "audit_log limpa"),
+    (None, 'system_activity', "", "system_activity limpa"),
+    ("Mantendo apenas usuário admin...", 'user', " WHERE username != 'admin'", "Usuários extras removidos"),
+    ("Resetando configurações...", 'license_store', "", "Configurações resetadas"),
+]
 
 def limpar_banco():
     """
@@ -19,64 +37,38 @@ def limpar_banco():
         print("   Execute este script na pasta TesteProgram")
         return False
     
+    conn = None
     try:
-        # Conectar ao banco
-        conn = sqlite3.connect(db_path)
+        # Conectar ao banco (autocommit; a transação é controlada manualmente)
+        conn = _connect(db_path)
         cursor = conn.cursor()
         
         print("🧹 Limpando banco de dados para nova máquina...")
         
-        # 1. LIMPAR SISTEMA DE LICENÇAS (principal problema)
-        print("   → Removendo licenças antigas...")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='system_license'")
-        if cursor.fetchone():
-            cursor.execute("DELETE FROM system_license")
-            print("     ✅ Licenças removidas")
-        else:
-            print("     ⚪ Tabela system_license não existe")
-        
-        # 2. LIMPAR CHAMADOS DE TESTE (se tabela existir)
-        print("   → Verificando chamados de teste...")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='chamado'")
-        if cursor.fetchone():
-            cursor.execute("DELETE FROM chamado")
-            print("     ✅ Chamados removidos")
-        else:
-            print("     ⚪ Tabela chamado não existe")
-        
-        # 3. LIMPAR LOGS DE ATIVIDADE (se tabelas existirem)
-        print("   → Removendo logs antigos...")
-        for table in ['audit_log', 'system_activity']:
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
-            if cursor.fetchone():
-                cursor.execute(f"DELETE FROM {table}")
-                print(f"     ✅ {table} limpa")
+        # Uma única transação para toda a limpeza: um só fsync no COMMIT
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        # Descobrir de uma vez quais tabelas existem (evita uma consulta por tabela)
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name IN (?, ?, ?, ?, ?, ?, ?)",
+            ('system_license', 'chamado', 'audit_log', 'system_activity', 'user', 'license_store', 'role')
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        
+        # 1-5. Licenças, chamados de teste, logs, usuários extras e configurações
+        for passo, tabela, where, mensagem in LIMPEZA:
+            if passo:
+                print(f"   → {passo}")
+            if tabela in existing:
+                cursor.execute(f"DELETE FROM {tabela}{where}")
+                print(f"     ✅ {mensagem}")
             else:
-                print(f"     ⚪ Tabela {table} não existe")
-        
-        # 4. MANTER APENAS O ADMIN PADRÃO (se tabela user existir)
-        print("   → Mantendo apenas usuário admin...")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user'")
-        if cursor.fetchone():
-            cursor.execute("DELETE FROM user WHERE username != 'admin'")
-            print("     ✅ Usuários extras removidos")
-        else:
-            print("     ⚪ Tabela user não existe")
-        
-        # 5. RESETAR CONFIGURAÇÕES DO SISTEMA
-        print("   → Resetando configurações...")
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='license_store'")
-        if cursor.fetchone():
-            cursor.execute("DELETE FROM license_store")
-            print("     ✅ Configurações resetadas")
-        else:
-            print("     ⚪ Tabela license_store não existe")
+                print(f"     ⚪ Tabela {tabela} não existe")
         
         # 6. GARANTIR PAPÉIS PADRÃO (CRITICAL - Para sistema de papéis funcionar)
         print("   → Verificando papéis padrão do sistema...")
         
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='role'")
-        if cursor.fetchone():
+        if 'role' in existing:
             # Verificar se existem papéis padrão, se não criar
             papeis_padrao = [
                 ('admin', 'Administrador', 'Acesso total ao sistema', '["manage_users", "manage_sectors", "manage_roles", "view_all", "edit_all", "delete_all", "close_tickets", "create_tickets", "view_reports", "manage_settings"]'),
@@ -84,52 +76,28 @@ def limpar_banco():
                 ('usuario', 'Usuário', 'Usuário básico', '["view_own", "create_tickets"]')
             ]
             
-            for name, display_name, description, permissions in papeis_padrao:
-                cursor.execute("SELECT COUNT(*) FROM role WHERE name = ?", (name,))
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute("""
-                        INSERT INTO role (name, display_name, description, permissions, active, created_at, updated_at) 
-                        VALUES (?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-                    """, (name, display_name, description, permissions))
-                    print(f"     ✅ Papel '{display_name}' criado")
-                else:
-                    print(f"     ⚪ Papel '{display_name}' já existe")
+            # role.name é UNIQUE: OR IGNORE mantém os papéis que já existem
+            cursor.executemany("""
+                INSERT OR IGNORE INTO role (name, display_name, description, permissions, active, created_at, updated_at) 
+                VALUES (?, ?, ?, ?, 1, datetime('now'), datetime('now'))
+            """, papeis_padrao)
+            criados = cursor.rowcount
+            print(f"     ✅ {criados} papel(is) padrão criado(s)")
+            if criados < len(papeis_padrao):
+                print(f"     ⚪ {len(papeis_padrao) - criados} papel(is) padrão já existia(m)")
         else:
             print("     ⚪ Tabela role não existe - execute o sistema primeiro para criar tabelas")
         
         # Confirmar mudanças
-        conn.commit()
-        
-        # Mostrar estatísticas
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user'")
-        if cursor.fetchone():
-            cursor.execute("SELECT COUNT(*) FROM user")
-            users = cursor.fetchone()[0]
-        else:
-            users = 0
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='system_license'")
-        if cursor.fetchone():
-            cursor.execute("SELECT COUNT(*) FROM system_license")
-            licenses = cursor.fetchone()[0]
-        else:
-            licenses = 0
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='chamado'")
-        if cursor.fetchone():
-            cursor.execute("SELECT COUNT(*) FROM chamado")
-            tickets = cursor.fetchone()[0]
-        else:
-            tickets = 0
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='role'")
-        if cursor.fetchone():
-            cursor.execute("SELECT COUNT(*) FROM role")
-            roles = cursor.fetchone()[0]
-        else:
-            roles = 0
+        cursor.execute("COMMIT")
         
-        conn.close()
+        # Mostrar estatísticas (uma única consulta; 0 para tabelas inexistentes)
+        contagens = ", ".join(
+            f"(SELECT COUNT(*) FROM {table})" if table in existing else "0"
+            for table in ('user', 'system_license', 'chamado', 'role')
+        )
+        cursor.execute(f"SELECT {contagens}")
+        users, licenses, tickets, roles = cursor.fetchone()
         
         print("\n✅ BANCO LIMPO COM SUCESSO!")
         print(f"   👥 Usuários: {users} (admin mantido)")
@@ -142,8 +110,13 @@ def limpar_banco():
         return True
         
     except Exception as e:
+        if conn is not None and conn.in_transaction:
+            conn.execute("ROLLBACK")
         print(f"❌ Erro ao limpar banco: {e}")
         return False
+    finally:
+        if conn is not None:
+            conn.close()
 
 if __name__ == "__main__":
     print("=" * 60)
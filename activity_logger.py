@@ -13,6 +13,48 @@ from typing import Dict, List, Optional
 from flask import request, session
 import os
 import sys
+import atexit
+import queue
+import threading
+import time
+from urllib.request import pathname2url
+
+# orjson (opcional) serializa os detalhes bem mais rápido que o json da stdlib
+try:
+    import orjson
+    
+    def _json_dumps(obj) -> str:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            # Tipos que o orjson não aceita (ex.: chaves não-string)
+            return json.dumps(obj)
+except ImportError:
+    _json_dumps = json.dumps
+
+# Formato da coluna timestamp (CURRENT_TIMESTAMP do SQLite): limites de datas das
+# consultas são formatados assim, para comparar como texto com a coluna
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Cor (classe Bootstrap) por tipo de ação; os tipos são sempre gravados em maiúsculas
+_ACTION_COLOR = {
+    'LOGIN': 'success',
+    'LOGOUT': 'secondary',
+    'CREATE': 'primary',
+    'UPDATE': 'warning',
+    'DELETE': 'danger',
+    'ADMIN': 'info',
+    'SYSTEM': 'dark',
+    'ERROR': 'danger',
+    'SECURITY': 'warning'
+}
+
+def _connect(path: str) -> sqlite3.Connection:
+    """Abrir conexão SQLite (URI, autocommit, multi-thread) com cache de páginas de 20MB"""
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}", uri=True,
+                           check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA cache_size=-20000')
+    return conn
 
 class ColoredFormatter(logging.Formatter):
     """Formatador colorido para logs no console"""
@@ -27,28 +69,120 @@ class ColoredFormatter(logging.Formatter):
         'RESET': '\033[0m'       # Reset
     }
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sem terminal (arquivo/pipe) não há cor; nomes coloridos calculados uma vez
+        self._use_color = sys.stdout.isatty()
+        self._colored_names = {
+            level: f"{color}{level}{self.COLORS['RESET']}"
+            for level, color in self.COLORS.items() if level != 'RESET'
+        }
+    
     def format(self, record):
-        # Adicionar cor para o nível de log
-        levelname = record.levelname
-        if levelname in self.COLORS:
-            record.levelname_color = self.COLORS[levelname]
-        else:
-            record.levelname_color = ''
-        record.reset = self.COLORS['RESET']
+        colored = self._colored_names.get(record.levelname) if self._use_color else None
+        if colored is None:
+            return super().format(record)
         
-        return super().format(record)
+        # Colorir o nível direto no record e restaurar depois
+        levelname = record.levelname
+        record.levelname = colored
+        try:
+            return super().format(record)
+        finally:
+            record.levelname = levelname
 
 class ActivityLogger:
+    _insert_sql = '''
+        INSERT INTO system_activity 
+        (user_id, username, action_type, action_description, details, 
+         ip_address, user_agent, session_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    # Fila de inserts gravada em lotes por uma thread em segundo plano
+    _buf_max = 100
+    # Tamanho dos lotes de DELETE em cleanup_old_activities
+    _cleanup_batch = 10000
+    # Intervalo (segundos) para recontar o total geral do zero em get_activity_stats; entre
+    # recontagens só as linhas novas (id acima do último contado) são somadas ao total
+    _stats_recount_ttl = 300
+    # Handlers de log já instalados neste processo
+    _logging_configured = False
+    
     def __init__(self, db_path: str = "sistema_os.db"):
         self.db_path = db_path
         self.setup_logging()
+        # Conexão única por processo reaproveitada por todas as chamadas (protegida por lock);
+        # aberta sob demanda e reaberta em processos filhos (gunicorn com preload_app)
+        self._lock = threading.Lock()
+        self._conn_obj = None
+        self._conn_pid = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+        self._q = queue.Queue(maxsize=10000)
+        # Thread de gravação iniciada no primeiro evento de cada processo: uma thread
+        # iniciada no import não existe nos workers criados por fork
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+        # (momento da contagem completa, total, último id contado) de get_activity_stats
+        self._stats_total = None
         self.create_activity_table()
+        self.configure_pragmas()
+        atexit.register(self._flush)
+    
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão deste processo: uma conexão SQLite não pode ser usada depois de um fork"""
+        pid = os.getpid()
+        if self._conn_pid != pid:
+            # A herdada do processo pai é só abandonada (fechá-la aqui mexeria no estado do pai)
+            self._conn_obj = self._connect()
+            self._conn_pid = pid
+        return self._conn_obj
+    
+    def _after_fork_in_child(self):
+        """No processo filho: locks e fila novos (os herdados podem ter sido copiados travados)"""
+        self._lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        # Eventos ainda na fila herdada pertencem ao processo pai, que os grava
+        self._q = queue.Queue(maxsize=10000)
+    
+    def _ensure_writer(self):
+        """Iniciar a thread _writer uma vez por processo (PID)"""
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+        with self._writer_lock:
+            if self._writer_pid != pid:
+                threading.Thread(target=self._writer, name='ActivityLoggerWriter', daemon=True).start()
+                self._writer_pid = pid
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Abrir conexão com o banco de atividades já com PRAGMAs por conexão"""
+        conn = _connect(self.db_path)
+        # NORMAL é seguro em WAL e evita um fsync extra por transação
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def configure_pragmas(self):
+        """Configurar WAL e PRAGMAs de performance (journal_mode persiste no arquivo)"""
+        try:
+            with self._lock:
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA temp_store=MEMORY')
+                self._conn.execute('PRAGMA mmap_size=268435456')  # 256MB
+        except Exception as e:
+            self.logger.error(f"Erro ao configurar PRAGMAs do banco de atividades: {e}")
     
     def setup_logging(self):
         """Configurar logging estruturado com rotação e formatação colorida"""
+        # Handlers são configurados uma única vez por processo
+        if ActivityLogger._logging_configured:
+            self.logger = logging.getLogger('ActivityLogger')
+            return
+        
         # Formatter with colors for console
         console_formatter = ColoredFormatter(
-            '%(asctime)s - %(levelname_color)s%(levelname)s%(reset)s - %(name)s - %(message)s',
+            '%(asctime)s - %(levelname)s - %(name)s - %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         
@@ -68,7 +202,11 @@ class ActivityLogger:
             backupCount=5,
             encoding='utf-8'
         )
-        file_handler.setLevel(logging.DEBUG)
+        # Nível do arquivo configurável (ex.: LOG_LEVEL=INFO em produção)
+        file_level = logging.getLevelName(os.environ.get('LOG_LEVEL', 'DEBUG').upper())
+        if not isinstance(file_level, int):
+            file_level = logging.DEBUG
+        file_handler.setLevel(file_level)
         file_handler.setFormatter(file_formatter)
         
         # Console handler with colors
@@ -78,47 +216,74 @@ class ActivityLogger:
         
         # Configure logger
         self.logger = logging.getLogger('ActivityLogger')
-        self.logger.setLevel(logging.DEBUG)
+        # Nível do logger = menor nível entre os handlers, para descartar cedo o resto
+        self.logger.setLevel(min(file_level, logging.INFO))
         self.logger.handlers.clear()  # Clear any existing handlers
         self.logger.addHandler(file_handler)
         self.logger.addHandler(console_handler)
         
         # Prevent propagation to root logger
         self.logger.propagate = False
+        ActivityLogger._logging_configured = True
     
     def create_activity_table(self):
         """Criar tabela de atividades se não existir"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS system_activity (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    user_id INTEGER,
-                    username TEXT,
-                    action_type TEXT NOT NULL,
-                    action_description TEXT NOT NULL,
-                    details TEXT,
-                    ip_address TEXT,
-                    user_agent TEXT,
-                    session_id TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Criar índices para melhor performance
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON system_activity(timestamp)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_user ON system_activity(user_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_type ON system_activity(action_type)')
-            
-            conn.commit()
-            conn.close()
+            with self._lock:
+                cursor = self._conn.cursor()
+                
+                # Esta é a primeira tabela criada no arquivo: em bancos novos (ainda vazios) liga
+                # o auto-vacuum incremental; nos existentes só valeria após um VACUUM completo
+                if not cursor.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchone():
+                    cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS system_activity (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        user_id INTEGER,
+                        username TEXT,
+                        action_type TEXT NOT NULL,
+                        action_description TEXT NOT NULL,
+                        details TEXT,
+                        ip_address TEXT,
+                        user_agent TEXT,
+                        session_id TEXT,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Criar índices para melhor performance (tabela de escrita intensa: poucos índices)
+                # (timestamp, action_type) cobre as estatísticas por intervalo de tempo
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_ts_type ON system_activity(timestamp, action_type)')
+                # Painel de atividades recentes e paginação por cursor da tela de logs: (timestamp, id) < (?, ?)
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_ts_id ON system_activity(timestamp DESC, id DESC)')
+                # Índices antigos que começavam por timestamp: cobertos por idx_activity_ts_id
+                cursor.execute('DROP INDEX IF EXISTS idx_activity_timestamp')
+                cursor.execute('DROP INDEX IF EXISTS idx_activity_recent')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_user ON system_activity(user_id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_type ON system_activity(action_type)')
+                # Estatísticas do planejador (amostra limitada): escolhe (timestamp, action_type)
+                # nas agregações da auditoria em vez do índice só de action_type. Uma vez só:
+                # persistem no arquivo (sqlite_stat1) e não precisam ser refeitas a cada boot
+                if not self._has_planner_stats(cursor):
+                    cursor.execute('PRAGMA analysis_limit=400')
+                    cursor.execute('ANALYZE system_activity')
             
         except Exception as e:
             self.logger.error(f"Erro ao criar tabela de atividades: {e}")
     
+    @staticmethod
+    def _has_planner_stats(cursor) -> bool:
+        """sqlite_stat1 já tem estatísticas dos índices de timestamp de system_activity?"""
+        try:
+            cursor.execute('''
+                SELECT COUNT(*) FROM sqlite_stat1
+                WHERE tbl = 'system_activity' AND idx IN ('idx_activity_ts_type', 'idx_activity_ts_id')
+            ''')
+            return cursor.fetchone()[0] == 2
+        except sqlite3.OperationalError:
+            return False  # sqlite_stat1 não existe: nenhum ANALYZE foi feito
+    
     def debug(self, message: str, **kwargs):
         """Log mensagem de debug"""
         self.logger.debug(message, **kwargs)
@@ -144,122 +309,122 @@ class ActivityLogger:
                     details: Optional[Dict] = None):
         """Registrar uma atividade do sistema"""
         try:
-            # Obter informações da requisição atual se disponível
-            ip_address = self.get_client_ip()
-            user_agent = self.get_user_agent()
-            session_id = self.get_session_id()
+            # Sem detalhes (login/logout/eventos simples) grava NULL sem passar pelo JSON
+            details_json = _json_dumps(details) if details else None
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO system_activity 
-                (user_id, username, action_type, action_description, details, 
-                 ip_address, user_agent, session_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user_id,
-                username,
-                action_type,
-                action_description,
-                json.dumps(details) if details else None,
-                ip_address,
-                user_agent,
-                session_id
-            ))
+            # Linha na ordem das colunas de _insert_sql; meta da requisição atual se disponível
+            row = (user_id, username, action_type, action_description, details_json,
+                   *self._request_meta())
             
-            conn.commit()
-            conn.close()
+            # Nunca bloquear a requisição: a gravação fica com a thread _writer
+            self._ensure_writer()
+            try:
+                self._q.put_nowait(row)
+            except queue.Full:
+                self.logger.warning(f"Fila de atividades cheia, evento descartado: {action_type}")
+                return
             
-            self.logger.info(f"Atividade registrada: {action_type} - {action_description} - Usuário: {username}")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(f"Atividade registrada: {action_type} - {action_description} - Usuário: {username}")
             
         except Exception as e:
             self.logger.error(f"Erro ao registrar atividade: {e}")
     
-    def get_client_ip(self) -> str:
-        """Obter IP do cliente"""
-        try:
-            if request:
-                return request.environ.get('HTTP_X_FORWARDED_FOR', 
-                                         request.environ.get('REMOTE_ADDR', 'unknown'))
-            return 'system'
-        except:
-            return 'system'
+    def _writer(self):
+        """Thread consumidora: agrupa eventos da fila e grava em lote"""
+        while True:
+            try:
+                row = self._q.get(timeout=1)
+            except queue.Empty:
+                continue
+            with self._lock:
+                rows = [row] + self._drain(self._buf_max - 1)
+                self._write_rows(rows)
+    
+    def _drain(self, limit: Optional[int] = None) -> List[tuple]:
+        """Retirar da fila, sem bloquear, os eventos pendentes"""
+        rows = []
+        while limit is None or len(rows) < limit:
+            try:
+                rows.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+    
+    def _flush(self):
+        """Gravar imediatamente tudo o que estiver na fila (leituras e saída do processo)"""
+        with self._lock:
+            rows = self._drain()
+            if rows:
+                self._write_rows(rows)
     
-    def get_user_agent(self) -> str:
-        """Obter User Agent do cliente"""
+    def _write_rows(self, rows: List[tuple]):
+        """Gravar eventos com executemany em uma única transação (chamar com o lock)"""
+        cursor = self._conn.cursor()
         try:
-            if request:
-                return request.environ.get('HTTP_USER_AGENT', 'unknown')[:500]
-            return 'system'
-        except:
-            return 'system'
+            cursor.execute('BEGIN')
+            cursor.executemany(self._insert_sql, rows)
+            cursor.execute('COMMIT')
+        except Exception as e:
+            if self._conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            self.logger.error(f"Erro ao gravar {len(rows)} atividade(s): {e}")
     
-    def get_session_id(self) -> str:
-        """Obter ID da sessão"""
+    def _request_meta(self) -> tuple:
+        """Obter IP, User Agent e ID da sessão lendo request.environ uma única vez"""
         try:
-            if session:
-                return str(session.get('_id', 'no_session'))[:50]
-            return 'no_session'
-        except:
-            return 'no_session'
+            env = request.environ
+            return (
+                env.get('HTTP_X_FORWARDED_FOR', env.get('REMOTE_ADDR', 'unknown')),
+                env.get('HTTP_USER_AGENT', 'unknown')[:500],
+                str(session.get('_id', 'no_session'))[:50]
+            )
+        except Exception:
+            # Fora de uma requisição (threads, scripts, inicialização)
+            return ('system', 'system', 'no_session')
     
     def get_recent_activities(self, limit: int = 50) -> List[Dict]:
         """Obter atividades recentes"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT timestamp, username, action_type, action_description, 
-                       details, ip_address
-                FROM system_activity 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (limit,))
-            
-            activities = []
-            for row in cursor.fetchall():
-                timestamp, username, action_type, description, details, ip = row
-                
-                # Determinar cor do tipo de ação
-                type_color = self.get_action_color(action_type)
-                
-                activities.append({
-                    'timestamp': self.format_timestamp(timestamp),
-                    'user': username or 'Sistema',
-                    'action': action_type,
-                    'details': description,
-                    'ip': ip or 'N/A',
-                    'type_color': type_color
-                })
+            self._flush()
+            with self._lock:
+                # Formatação e valores padrão resolvidos no próprio SQLite
+                rows = self._conn.execute('''
+                    SELECT COALESCE(strftime('%d/%m %H:%M', timestamp), timestamp),
+                           COALESCE(username, 'Sistema'), action_type, action_description, 
+                           COALESCE(ip_address, 'N/A')
+                    FROM system_activity 
+                    ORDER BY timestamp DESC 
+                    LIMIT ?
+                ''', (limit,)).fetchall()
             
-            conn.close()
-            return activities
+            return [{
+                'timestamp': timestamp,
+                'user': username,
+                'action': action_type,
+                'details': description,
+                'ip': ip,
+                'type_color': _ACTION_COLOR.get(action_type, 'secondary')
+            } for timestamp, username, action_type, description, ip in rows]
             
         except Exception as e:
             self.logger.error(f"Erro ao obter atividades recentes: {e}")
             return []
     
+    def query(self, sql: str, params=()) -> List[tuple]:
+        """Executar uma consulta de leitura na conexão persistente (inclui logs ainda na fila)"""
+        self._flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+    
     def get_action_color(self, action_type: str) -> str:
-        """Determinar cor para tipo de ação"""
-        color_map = {
-            'LOGIN': 'success',
-            'LOGOUT': 'secondary',
-            'CREATE': 'primary',
-            'UPDATE': 'warning',
-            'DELETE': 'danger',
-            'ADMIN': 'info',
-            'SYSTEM': 'dark',
-            'ERROR': 'danger',
-            'SECURITY': 'warning'
-        }
-        return color_map.get(action_type.upper(), 'secondary')
+        """Determinar cor para tipo de ação (tipos em maiúsculas, ex.: 'LOGIN')"""
+        return _ACTION_COLOR.get(action_type, 'secondary')
     
     def format_timestamp(self, timestamp_str: str) -> str:
         """Formatar timestamp para exibição"""
         try:
-            dt = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
+            dt = datetime.strptime(timestamp_str, TIMESTAMP_FORMAT)
             return dt.strftime('%d/%m %H:%M')
         except:
             return timestamp_str
@@ -267,34 +432,37 @@ class ActivityLogger:
     def get_activity_stats(self) -> Dict:
         """Obter estatísticas de atividades"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Atividades das últimas 24 horas
-            yesterday = datetime.now() - timedelta(days=1)
-            cursor.execute('''
-                SELECT COUNT(*) FROM system_activity 
-                WHERE timestamp > ?
-            ''', (yesterday.strftime('%Y-%m-%d %H:%M:%S'),))
-            
-            last_24h = cursor.fetchone()[0]
+            yesterday = (datetime.now() - timedelta(days=1)).strftime(TIMESTAMP_FORMAT)
             
-            # Total de atividades
-            cursor.execute('SELECT COUNT(*) FROM system_activity')
-            total = cursor.fetchone()[0]
-            
-            # Atividades por tipo nas últimas 24h
-            cursor.execute('''
-                SELECT action_type, COUNT(*) 
-                FROM system_activity 
-                WHERE timestamp > ?
-                GROUP BY action_type
-                ORDER BY COUNT(*) DESC
-            ''', (yesterday.strftime('%Y-%m-%d %H:%M:%S'),))
-            
-            by_type = dict(cursor.fetchall())
+            self._flush()
+            with self._lock:
+                now = time.monotonic()
+                if self._stats_total is None or now - self._stats_total[0] > self._stats_recount_ttl:
+                    self._stats_total = (now, 0, 0)  # recontagem completa (id > 0)
+                counted_at, counted, last_id = self._stats_total
+                # Um único comando (mesmo instantâneo do banco): últimas 24h por tipo em
+                # idx_activity_ts_type (o "+" impede que o planejador troque a busca pelo índice
+                # só de action_type, que varre a tabela) e as linhas ainda não contadas no total,
+                # um intervalo de rowid. action_type é NOT NULL: NULL marca a linha do total
+                rows = self._conn.execute('''
+                    SELECT action_type, COUNT(*), NULL
+                    FROM system_activity 
+                    WHERE timestamp > ?
+                    GROUP BY +action_type
+                    UNION ALL
+                    SELECT NULL, COUNT(*), MAX(id)
+                    FROM system_activity
+                    WHERE id > ?
+                ''', (yesterday, last_id)).fetchall()
+                
+                new_rows, max_id = next((count, max_id) for action_type, count, max_id in rows
+                                        if action_type is None)
+                total = counted + new_rows
+                self._stats_total = (counted_at, total, max_id or last_id)
             
-            conn.close()
+            recent = [(action_type, count) for action_type, count, _ in rows if action_type is not None]
+            last_24h = sum(count for _, count in recent)
+            by_type = dict(sorted(recent, key=lambda item: item[1], reverse=True))
             
             return {
                 'last_24h': last_24h,
@@ -309,19 +477,29 @@ class ActivityLogger:
     def cleanup_old_activities(self, days_to_keep: int = 90):
         """Limpar atividades antigas para manter performance"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+            cutoff = (datetime.now() - timedelta(days=days_to_keep)).strftime(TIMESTAMP_FORMAT)
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                DELETE FROM system_activity 
-                WHERE timestamp < ?
-            ''', (cutoff_date.strftime('%Y-%m-%d %H:%M:%S'),))
+            self._flush()
+            # Remover em lotes (cada DELETE é uma transação curta em autocommit),
+            # liberando o lock entre lotes para não travar os demais acessos
+            deleted_count = 0
+            while True:
+                with self._lock:
+                    cursor = self._conn.execute('''
+                        DELETE FROM system_activity 
+                        WHERE rowid IN (
+                            SELECT rowid FROM system_activity 
+                            WHERE timestamp < ? 
+                            LIMIT ?
+                        )
+                    ''', (cutoff, self._cleanup_batch))
+                    batch = cursor.rowcount
+                deleted_count += batch
+                if batch < self._cleanup_batch:
+                    break
             
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+            # Linhas removidas já estavam no total de get_activity_stats: recontar
+            self._stats_total = None
             
             self.logger.info(f"Limpeza de atividades: {deleted_count} registros removidos")
             return deleted_count
@@ -333,6 +511,8 @@ class ActivityLogger:
 # Instância global do logger (path padrão, pode ser sobrescrito via init_app)
 activity_logger = ActivityLogger(db_path="instance/sistema_os.db")
 
+_MODULE_LOGGERS: Dict[str, logging.Logger] = {}
+
 def create_module_logger(module_name: str, log_level=logging.INFO) -> logging.Logger:
     """
     Criar logger específico para módulo com formatação consistente
@@ -344,9 +524,13 @@ def create_module_logger(module_name: str, log_level=logging.INFO) -> logging.Lo
     Returns:
         Logger configurado para o módulo
     """
+    # Reaproveitar o logger já configurado (evita handlers e arquivos duplicados)
+    if module_name in _MODULE_LOGGERS:
+        return _MODULE_LOGGERS[module_name]
+    
     # Formatador colorido para console
     console_formatter = ColoredFormatter(
-        f'%(asctime)s - %(levelname_color)s%(levelname)s%(reset)s - {module_name} - %(message)s',
+        f'%(asctime)s - %(levelname)s - {module_name} - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     
@@ -383,6 +567,7 @@ def create_module_logger(module_name: str, log_level=logging.INFO) -> logging.Lo
     logger.addHandler(console_handler)
     logger.propagate = False
     
+    _MODULE_LOGGERS[module_name] = logger
     return logger
 
 # Funções de conveniência para uso fácil
@@ -1,30 +1,49 @@
-from flask import Flask, render_template, request, redirect, url_for, session, send_file, abort, flash
+from flask import Flask, render_template, request, redirect, url_for, session, send_file, abort, flash, g, has_request_context, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO, emit
-from sqlalchemy import text
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import text, bindparam, tuple_, case, create_engine, event
+from sqlalchemy.orm import joinedload, selectinload, raiseload, load_only, aliased
 from werkzeug.security import generate_password_hash, check_password_hash
+# argon2 (opcional): hash de senha mais rápido que o scrypt padrão do werkzeug
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+    # Instância única reaproveitada em todos os logins; parâmetros mínimos do OWASP
+    # para argon2id (19 MiB, 2 iterações) - hashes antigos são regravados no login
+    password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+except ImportError:
+    password_hasher = None
 from werkzeug.utils import secure_filename
-from functools import wraps
-from datetime import datetime, timedelta
-import pytz
-import io, os, shutil
+from markupsafe import escape
+from functools import wraps, lru_cache
+from collections import namedtuple
+from contextlib import contextmanager, suppress
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import io, os, shutil, secrets, threading, base64, time, hashlib
 import psutil
 import json
 import sqlite3
 
+# Lock de arquivo entre processos (migration_lock): fcntl no Linux/macOS, msvcrt no Windows
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
 # Configure Brasília timezone (GMT-3)
-BRAZIL_TZ = pytz.timezone('America/Sao_Paulo')
+# Offset fixo: São Paulo não tem horário de verão desde 2019, então não há
+# necessidade das regras do pytz/zoneinfo a cada chamada
+BRAZIL_TZ = timezone(timedelta(hours=-3), 'America/Sao_Paulo')
 
 def now_brazil():
     """Return current datetime in Brazil timezone (GMT-3)"""
     return datetime.now(BRAZIL_TZ).replace(tzinfo=None)
-import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 import uuid
 
 # SISTEMAS DE LICENCIAMENTO REATIVADOS
@@ -79,27 +98,179 @@ SETOR_INTERNAL_VALUES = {
     "CCIH / SESMT / Manutenção de Ar condicionado": "ccih_sesmt_arcondicionado",
     "Telefonia e outros serviços": "telefonia_outros"
 }
+# Mapa inverso (valor interno -> nome exibido), calculado uma vez
+SETOR_REVERSE = {v: k for k, v in SETOR_INTERNAL_VALUES.items()}
 
 # File upload configuration
 UPLOAD_FOLDER = 'static/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif'})
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+# Corpo máximo dos formulários de chamado (3 imagens + campos): acima disso a requisição
+# é recusada com 413 antes de ser lida (request.max_content_length nas rotas de chamado)
+TICKET_FORM_MAX_LENGTH = 3 * MAX_FILE_SIZE + (1 << 20)
+
+class UploadTooLarge(Exception):
+    """Imagem enviada maior que MAX_FILE_SIZE"""
 
 def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return '.' in filename and filename.rpartition('.')[2].lower() in ALLOWED_EXTENSIONS
+
+# Blocos de 1 MiB: menos chamadas read/write por imagem
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Remoção de arquivos fora da requisição (imagens antigas após o commit, relatórios)
+_file_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='uploads')
+
+def _remove_uploaded_files(filenames):
+    for name in filenames:
+        try:
+            with suppress(FileNotFoundError):
+                os.unlink(os.path.join(UPLOAD_FOLDER, name))
+        except OSError as e:
+            print(f"⚠️ Erro ao remover imagem {name}: {e}")
+
+def remove_uploaded_files(filenames):
+    """Agendar a remoção de arquivos de upload em background"""
+    if filenames:
+        _file_executor.submit(_remove_uploaded_files, list(filenames))
+
+# Limpeza de relatórios em background: o progresso de cada job fica no Redis
+# (quando configurado) ou na tabela report_cleanup_job, visível a todos os workers
+_REPORT_CLEANUP_KEEP = 20
+_REPORT_CLEANUP_TTL = 3600  # segundos que o progresso fica disponível no Redis
+_REPORT_CLEANUP_SAVE_EVERY = 200  # arquivos removidos entre gravações do progresso
+
+_REPORT_CLEANUP_DDL = text("""
+    CREATE TABLE IF NOT EXISTS report_cleanup_job (
+        id TEXT PRIMARY KEY,
+        total INTEGER,
+        removed INTEGER NOT NULL DEFAULT 0,
+        done INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+""")
+
+def _save_cleanup_job(engine, job_id, job):
+    if redis_client:
+        try:
+            key = f"report_cleanup:{job_id}"
+            pipe = redis_client.pipeline()
+            pipe.hset(key, mapping={
+                'total': '' if job['total'] is None else job['total'],
+                'removed': job['removed'],
+                'done': int(job['done']),
+                'error': job['error'] or '',
+            })
+            pipe.expire(key, _REPORT_CLEANUP_TTL)
+            pipe.execute()
+            return
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar progresso da limpeza no Redis: {e}")
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO report_cleanup_job (id, total, removed, done, error)
+                VALUES (:id, :total, :removed, :done, :error)
+                ON CONFLICT(id) DO UPDATE SET total = excluded.total, removed = excluded.removed,
+                                              done = excluded.done, error = excluded.error
+            """), {'id': job_id, 'total': job['total'], 'removed': job['removed'],
+                   'done': int(job['done']), 'error': job['error']})
+    except Exception as e:
+        print(f"⚠️ Erro ao gravar progresso da limpeza: {e}")
+
+def _load_cleanup_job(job_id):
+    """Progresso de um job de limpeza (qualquer worker) ou None se desconhecido"""
+    if redis_client:
+        try:
+            data = redis_client.hgetall(f"report_cleanup:{job_id}")
+            if data:
+                return {
+                    'total': int(data['total']) if data.get('total') else None,
+                    'removed': int(data.get('removed') or 0),
+                    'done': data.get('done') == '1',
+                    'error': data.get('error') or None,
+                }
+        except Exception as e:
+            print(f"⚠️ Erro ao ler progresso da limpeza no Redis: {e}")
+    try:
+        row = db.session.execute(
+            text("SELECT total, removed, done, error FROM report_cleanup_job WHERE id = :id"),
+            {'id': job_id}
+        ).fetchone()
+    except Exception:
+        # Tabela ainda não criada: nenhuma limpeza foi iniciada sem Redis
+        db.session.rollback()
+        return None
+    if row is None:
+        return None
+    return {'total': row.total, 'removed': row.removed, 'done': bool(row.done), 'error': row.error}
+
+def _delete_reports(engine, job_id, report_dir, user_id, username):
+    job = {'total': None, 'removed': 0, 'done': False, 'error': None}
+    try:
+        with os.scandir(report_dir) as it:
+            names = [entry.name for entry in it if entry.name.endswith(('.png', '.pdf'))]
+        job['total'] = len(names)
+        _save_cleanup_job(engine, job_id, job)
+        for name in names:
+            with suppress(FileNotFoundError):
+                os.unlink(os.path.join(report_dir, name))
+                job['removed'] += 1
+                if job['removed'] % _REPORT_CLEANUP_SAVE_EVERY == 0:
+                    _save_cleanup_job(engine, job_id, job)
+    except OSError as e:
+        job['error'] = str(e)
+        print(f"⚠️ Erro na limpeza de relatórios: {e}")
+    finally:
+        job['done'] = True
+        _save_cleanup_job(engine, job_id, job)
+    if activity_logger:
+        log_admin_action(user_id, username, f"Limpeza de relatórios - {job['removed']} arquivos removidos")
+
+def start_report_cleanup(user_id, username):
+    """Agendar a remoção dos PNG/PDF de relatórios em background; retorna o id do job"""
+    engine = db.engine
+    # Tabela também serve de fallback se o Redis falhar; mantém só os últimos jobs concluídos
+    try:
+        with engine.begin() as conn:
+            conn.execute(_REPORT_CLEANUP_DDL)
+            conn.execute(text("""
+                DELETE FROM report_cleanup_job
+                WHERE done = 1 AND id NOT IN (
+                    SELECT id FROM report_cleanup_job WHERE done = 1
+                    ORDER BY created_at DESC LIMIT :keep
+                )
+            """), {'keep': _REPORT_CLEANUP_KEEP})
+    except Exception as e:
+        print(f"⚠️ Erro ao preparar tabela de limpeza: {e}")
+    job_id = uuid4_hex()
+    _save_cleanup_job(engine, job_id, {'total': None, 'removed': 0, 'done': False, 'error': None})
+    _file_executor.submit(_delete_reports, engine, job_id, app.config["REPORT_DIR"], user_id, username)
+    return job_id
 
 def save_uploaded_file(file):
-    """Save uploaded file with secure name and return filename"""
+    """Save uploaded file with secure name and return filename (UploadTooLarge acima de MAX_FILE_SIZE)"""
     if file and file.filename and allowed_file(file.filename):
-        # Create unique filename to prevent conflicts
-        filename_parts = file.filename.rsplit('.', 1)
-        if len(filename_parts) > 1:
-            ext = filename_parts[1].lower()
-        else:
-            ext = 'unknown'
-        filename = f"{uuid.uuid4()}.{ext}"
-        file.save(os.path.join(UPLOAD_FOLDER, filename))
+        # Create unique filename to prevent conflicts (allowed_file garante a extensão)
+        ext = file.filename.rpartition('.')[2].lower()
+        filename = f"{secrets.token_hex(16)}.{ext}"
+        path = os.path.join(UPLOAD_FOLDER, filename)
+        
+        # Gravar em blocos, abortando se passar de MAX_FILE_SIZE
+        written = 0
+        with open(path, 'wb') as out:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > MAX_FILE_SIZE:
+                    break
+                out.write(chunk)
+        if written > MAX_FILE_SIZE:
+            os.remove(path)
+            raise UploadTooLarge(f"A imagem '{file.filename}' excede o limite de {MAX_FILE_SIZE // (1024 * 1024)} MB.")
         return filename
     return None
 
@@ -111,12 +282,38 @@ except ImportError:
     pass  # dotenv não instalado, continuar sem ele
 
 app = Flask(__name__)
-import secrets
 app.secret_key = os.getenv("FLASK_SECRET_KEY", secrets.token_hex(32))
+
+# orjson (opcional): jsonify/app.json serializam com orjson, bem mais rápido que o json da stdlib
+try:
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        # Mesma saída do provider padrão: datetimes passam por self.default (http_date,
+        # não ISO-8601) e as chaves continuam ordenadas (sort_keys)
+        _options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        
+        def dumps(self, obj, **kwargs):
+            if kwargs.get("indent"):
+                # saída indentada (modo debug): formatação que só a stdlib faz
+                return super().dumps(obj, **kwargs)
+            option = self._options
+            if kwargs.get("sort_keys", self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                return orjson.dumps(obj, default=self.default, option=option).decode()
+            except TypeError:
+                return super().dumps(obj)
+
+    app.json = OrjsonProvider(app)
+except ImportError:
+    pass  # orjson não instalado, jsonify usa o json da stdlib
 # Configuração de banco de dados SQLite
 
 # CONFIGURAÇÃO OTIMIZADA DE SQLITE PARA PRODUÇÃO
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///sistema_os.db"
+# SQLALCHEMY_DATABASE_URI no ambiente aponta para outro arquivo (ex.: banco temporário dos testes)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI", "sqlite:///sistema_os.db")
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     'pool_pre_ping': True,
     'pool_recycle': 300,
@@ -127,6 +324,8 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     'pool_timeout': 20,
     'pool_size': 10,
     'max_overflow': 20,
+    # Cache de SQL compilado do SQLAlchemy (padrão 500): muitas consultas pequenas e repetidas
+    'query_cache_size': 1200,
 }
 print("🗄️ Usando SQLite para desenvolvimento...")
 
@@ -134,15 +333,25 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # Performance optimization: Configure cache headers for static files
 app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000  # 1 year cache for static assets
+# Atrás de um proxy com mod_xsendfile (Apache) ou equivalente, USE_X_SENDFILE=1 faz o
+# Flask só enviar o cabeçalho X-Sendfile e o proxy transmite o arquivo (sendfile)
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE") == "1"
 app.config["REPORT_DIR"] = os.path.join("static", "relatorios")
 os.makedirs(app.config["REPORT_DIR"], exist_ok=True)
 
 # Ensure uploads directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Sistema de usuários online
-online_users = set()
-user_sessions = {}
+# Sistema de usuários online (em memória; com REDIS_URL usa o Redis, ver helpers abaixo)
+USER_SESSION_TTL = 600  # 10 minutos sem atividade = offline
+# Usuários online = chaves de user_sessions. Com cachetools as sessões inativas
+# expiram sozinhas (TTL), sem varreduras manuais
+try:
+    from cachetools import TTLCache
+    user_sessions = TTLCache(maxsize=50000, ttl=USER_SESSION_TTL)
+except ImportError:
+    user_sessions = {}
+user_sessions_lock = threading.Lock()
 
 # Add datetime functions to Jinja2
 @app.template_global()
@@ -152,7 +361,6 @@ def now():
 # Add JSON filter to Jinja2
 @app.template_filter('fromjson')
 def fromjson_filter(value):
-    import json
     try:
         return json.loads(value) if value else []
     except:
@@ -163,12 +371,14 @@ db = SQLAlchemy(app)
 # Configuração SocketIO para produção
 import os
 redis_url = os.getenv('REDIS_URL')
+# Log de cada evento do SocketIO só quando depurando (SOCKETIO_DEBUG=1)
+socketio_debug = os.getenv('SOCKETIO_DEBUG') == '1'
 
 if redis_url:
     # Produção com Redis para múltiplos workers
     socketio = SocketIO(app, 
                        cors_allowed_origins="*",
-                       logger=True, 
+                       logger=socketio_debug, 
                        engineio_logger=False,
                        async_mode='eventlet',
                        message_queue=redis_url,
@@ -181,7 +391,7 @@ else:
         import eventlet
         socketio = SocketIO(app, 
                            cors_allowed_origins="*", 
-                           logger=True, 
+                           logger=socketio_debug, 
                            engineio_logger=False,
                            async_mode='eventlet',
                            ping_timeout=60,
@@ -190,47 +400,378 @@ else:
     except ImportError:
         socketio = SocketIO(app, 
                            cors_allowed_origins="*", 
-                           logger=True, 
+                           logger=socketio_debug, 
                            engineio_logger=False,
                            async_mode='threading',
                            ping_timeout=60,
                            ping_interval=25)
         print("⚠️ SocketIO single-worker com threading")
 
+# Usuários online compartilhados entre workers via Redis (quando configurado)
+redis_client = None
+if redis_url:
+    try:
+        import redis
+        redis_client = redis.Redis.from_url(redis_url, decode_responses=True)
+    except ImportError:
+        print("⚠️ Pacote redis não instalado - usuários online ficam em memória")
+
+def mark_user_online(user):
+    """Registrar usuário como online ao fazer login"""
+    now_iso = datetime.now().isoformat()
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.sadd('online_users', user.id)
+            pipe.hset(f'user_session:{user.id}', mapping={
+                'login_time': now_iso,
+                'last_activity': now_iso,
+                'username': user.username
+            })
+            pipe.expire(f'user_session:{user.id}', USER_SESSION_TTL)
+            pipe.execute()
+            return
+        except Exception as e:
+            print(f"⚠️ Erro ao registrar usuário online no Redis: {e}")
+    with user_sessions_lock:
+        user_sessions[user.id] = {
+            'login_time': datetime.now(),
+            'last_activity': datetime.now(),
+            'username': user.username
+        }
+
+def mark_user_offline(user_id):
+    """Remover usuário da lista de online; retorna o username da sessão (ou None)"""
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hget(f'user_session:{user_id}', 'username')
+            pipe.srem('online_users', user_id)
+            pipe.delete(f'user_session:{user_id}')
+            return pipe.execute()[0]
+        except Exception as e:
+            print(f"⚠️ Erro ao remover usuário online do Redis: {e}")
+    with user_sessions_lock:
+        session_data = user_sessions.pop(user_id, None)
+    return session_data.get('username', 'Usuário') if session_data else None
+
+def touch_session(user_id):
+    """Atualizar última atividade (renova o TTL da sessão no Redis)"""
+    if redis_client:
+        try:
+            key = f'user_session:{user_id}'
+            pipe = redis_client.pipeline()
+            pipe.hset(key, 'last_activity', datetime.now().isoformat())
+            pipe.expire(key, USER_SESSION_TTL)
+            pipe.execute()
+            return
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar sessão no Redis: {e}")
+    with user_sessions_lock:
+        session_data = user_sessions.get(user_id)
+        if session_data:
+            session_data['last_activity'] = datetime.now()
+            user_sessions[user_id] = session_data  # renova o TTL
+
+# Versões compartilhadas entre workers (caches invalidados por alterações): no Redis
+# quando configurado, senão na tabela cache_version do próprio banco (sobrevive a reinícios)
+_CACHE_VERSION_DDL = text("""
+    CREATE TABLE IF NOT EXISTS cache_version (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+""")
+SHARED_VERSION_TTL = 30  # sem Redis nem banco: expira o cache a cada N segundos
+_local_versions = {}
+
+def shared_version(name):
+    """Versão atual de `name` (lida uma vez por requisição)"""
+    versions = g.setdefault('_shared_versions', {}) if has_request_context() else {}
+    if name in versions:
+        return versions[name]
+    version = None
+    if redis_client:
+        try:
+            version = int(redis_client.get(name) or 0)
+        except Exception as e:
+            print(f"⚠️ Erro ao ler versão '{name}' no Redis: {e}")
+    if version is None:
+        try:
+            # Conexão própria (leitura no WAL): não mexe na transação da requisição
+            with db.engine.connect() as conn:
+                version = conn.execute(text("SELECT version FROM cache_version WHERE name = :name"),
+                                       {'name': name}).scalar() or 0
+        except Exception as e:
+            if 'no such table' in str(e):
+                # Tabela ainda não criada: nenhuma versão foi incrementada
+                version = 0
+            else:
+                print(f"⚠️ Erro ao ler versão '{name}' no banco: {e}")
+                version = (_local_versions.get(name, 0), int(time.monotonic() // SHARED_VERSION_TTL))
+    versions[name] = version
+    return version
+
+def bump_shared_version(name):
+    """Incrementar a versão `name`, invalidando os caches dela em todos os workers"""
+    _local_versions[name] = _local_versions.get(name, 0) + 1
+    if has_request_context():
+        g.get('_shared_versions', {}).pop(name, None)
+    if redis_client:
+        try:
+            redis_client.incr(name)
+            return
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar versão '{name}' no Redis: {e}")
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(_CACHE_VERSION_DDL)
+            conn.execute(text("""
+                INSERT INTO cache_version (name, version) VALUES (:name, 1)
+                ON CONFLICT(name) DO UPDATE SET version = version + 1
+            """), {'name': name})
+    except Exception as e:
+        print(f"⚠️ Erro ao atualizar versão '{name}' no banco: {e}")
+
+# Versão dos setores cacheados nas sessões: incrementada quando setores ou
+# usuários mudam, invalidando session['sector_names'] em todas as sessões
+def sectors_version():
+    return shared_version('sectors_version')
+
+def bump_sectors_version():
+    bump_shared_version('sectors_version')
+
+# Versão dos papéis customizados (permissões em cache em _get_custom_role). Com Redis o
+# contador é compartilhado entre os workers; sem Redis cada worker só vê as próprias
+# alterações, então o cache também expira a cada ROLES_CACHE_TTL segundos
+ROLES_CACHE_TTL = 30
+_roles_version = 0
+
+def roles_version():
+    # Lida uma vez por requisição: has_permission é chamado várias vezes por página
+    if has_request_context() and '_roles_version' in g:
+        return g._roles_version
+    version = None
+    if redis_client:
+        try:
+            version = int(redis_client.get('roles_version') or 0)
+        except Exception as e:
+            print(f"⚠️ Erro ao ler versão dos papéis no Redis: {e}")
+    if version is None:
+        version = (_roles_version, int(time.monotonic() // ROLES_CACHE_TTL))
+    if has_request_context():
+        g._roles_version = version
+    return version
+
+def bump_roles_version():
+    global _roles_version
+    _roles_version += 1
+    _get_custom_role.cache_clear()
+    if redis_client:
+        try:
+            redis_client.incr('roles_version')
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar versão dos papéis no Redis: {e}")
+    if has_request_context():
+        g.pop('_roles_version', None)
+
+def remember_user_sectors(user, names=None, version=None):
+    """Guardar na sessão os setores do usuário logado (evita recalcular por requisição)"""
+    if names is None:
+        names = [s.name for s in user.get_sectors()]
+    session['sector_names'] = names
+    session['sectors_version'] = sectors_version() if version is None else version
+    return names
+
+# Setores ativos dos formulários: tupla imutável (não objetos ORM presos a uma sessão)
+# em cache até a próxima alteração de setores. A chave é sectors_version(), compartilhada
+# entre os workers: a alteração feita em um worker invalida o cache de todos
+SectorOption = namedtuple('SectorOption', 'id name display_name')
+
+# Setores padrão caso a tabela sector ainda não exista
+_DEFAULT_SECTOR_OPTIONS = (
+    SectorOption(None, 'ti', 'T.I'),
+    SectorOption(None, 'manutencao', 'Manutenção'),
+    SectorOption(None, 'ccih', 'CCIH / SESMT / Manutenção de Ar condicionado'),
+    SectorOption(None, 'telefonia', 'Telefonia e outros serviços'),
+)
+
+@lru_cache(maxsize=1)
+def _get_active_sectors_cached(version):
+    rows = db.session.query(Sector.id, Sector.name, Sector.display_name) \
+        .filter_by(active=True).order_by(Sector.display_name).all()
+    return tuple(SectorOption(*row) for row in rows)
+
+def get_active_sectors(fallback=()):
+    """Setores ativos ordenados por nome de exibição (fallback se a consulta falhar)"""
+    try:
+        return _get_active_sectors_cached(sectors_version())
+    except Exception:
+        return fallback
+
+# Filtros por setor aceitam name ou display_name (dados legados gravam o display_name):
+# apelido -> (name, display_name), em cache até a próxima alteração de setores (sectors_version)
+@lru_cache(maxsize=1)
+def _get_sector_aliases_cached(version):
+    rows = db.session.query(Sector.name, Sector.display_name).all()
+    aliases = {display_name: (name, display_name) for name, display_name in rows if display_name}
+    # name tem prioridade sobre um display_name igual de outro setor
+    aliases.update((name, (name, display_name)) for name, display_name in rows)
+    return aliases
+
+def get_sector_aliases():
+    """Mapa apelido -> (name, display_name) de todos os setores ({} se a consulta falhar)"""
+    try:
+        return _get_sector_aliases_cached(sectors_version())
+    except Exception:
+        return {}
+
+# Setores dos filtros de relatório caso a tabela sector ainda não exista
+_REPORT_SECTOR_FALLBACK = tuple(SectorOption(None, name, name) for name in SETOR_CHOICES)
+
+# Usuários dos filtros de relatório ("Responsável" e "Aberto por"), no mesmo esquema de versão:
+# criar/editar/excluir usuários chama bump_sectors_version()
+UserOption = namedtuple('UserOption', 'id username')
+
+@lru_cache(maxsize=1)
+def _get_report_user_options_cached(version):
+    rows = db.session.query(User.id, User.username, User.role) \
+        .filter(User.role.in_(["usuario", "operador", "admin"])).order_by(User.username).all()
+    operadores = tuple(UserOption(uid, username) for uid, username, role in rows if role in ("operador", "admin"))
+    usuarios = tuple(UserOption(uid, username) for uid, username, role in rows)
+    return operadores, usuarios
+
+def get_report_user_options():
+    """(operadores, usuarios) para os filtros do relatório"""
+    return _get_report_user_options_cached(sectors_version())
+
+@lru_cache(maxsize=128)
+def is_compras_sector(setor):
+    """Setor de compras (exige CDC)? Função pura do nome: resultado memorizado por setor"""
+    return bool(setor) and 'compra' in setor.casefold()
+
+def get_online_users():
+    """IDs dos usuários online (no Redis, descarta sessões expiradas)"""
+    if redis_client:
+        try:
+            ids = list(redis_client.smembers('online_users'))
+            if not ids:
+                return set()
+            pipe = redis_client.pipeline()
+            for uid in ids:
+                pipe.exists(f'user_session:{uid}')
+            alive = pipe.execute()
+            expired = [uid for uid, ok in zip(ids, alive) if not ok]
+            if expired:
+                redis_client.srem('online_users', *expired)
+            return {int(uid) for uid, ok in zip(ids, alive) if ok}
+        except Exception as e:
+            print(f"⚠️ Erro ao ler usuários online do Redis: {e}")
+    with user_sessions_lock:
+        if hasattr(user_sessions, 'expire'):
+            user_sessions.expire()
+        return set(user_sessions)
+
 # Performance optimization: Add cache headers for static files
+# (valores de Cache-Control prontos; evita o wrapper response.cache_control a cada resposta)
+_STATIC_EXT = ('.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.ico', '.woff', '.woff2', '.ttf')
+_CACHE_STATIC = 'public, max-age=31536000'     # 1 ano
+_CACHE_ASSET = 'public, max-age=2592000'       # 1 mês
+_CACHE_DYNAMIC = 'no-cache, must-revalidate, max-age=0'
+
 @app.after_request
 def add_cache_headers(response):
+    # Cache-Control definido pela própria view é mantido (downloads via send_file passam
+    # max_age=0; sem isso herdariam o SEND_FILE_MAX_AGE_DEFAULT de 1 ano dos estáticos)
+    if 'Cache-Control' in response.headers:
+        return response
     # Add cache headers for static assets to improve loading performance
     if request.endpoint == 'static':
-        # Cache static files for 1 year
-        response.cache_control.max_age = 31536000
-        response.cache_control.public = True
-    elif request.path.endswith(('.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.ico', '.woff', '.woff2', '.ttf')):
-        # Cache other assets for 1 month
-        response.cache_control.max_age = 2592000
-        response.cache_control.public = True
+        response.headers['Cache-Control'] = _CACHE_STATIC
+    elif request.path.endswith(_STATIC_EXT):
+        response.headers['Cache-Control'] = _CACHE_ASSET
     else:
-        # No cache for dynamic pages (but allow reasonable cache for performance)
-        response.cache_control.max_age = 0
-        response.cache_control.no_cache = True
-        response.cache_control.must_revalidate = True
+        # No cache for dynamic pages
+        response.headers['Cache-Control'] = _CACHE_DYNAMIC
     return response
 
+@app.errorhandler(413)
+def request_too_large(e):
+    """Formulário acima de request.max_content_length: recusado sem ler o corpo"""
+    back = escape(request.referrer or url_for("index"))
+    return (f"<p>Envio muito grande: o limite é de {MAX_FILE_SIZE // (1024 * 1024)} MB por imagem.</p>"
+            f'<p><a href="{back}">Voltar</a></p>'), 413
+
+@contextmanager
+def get_conn():
+    """
+    Conexão DBAPI (sqlite3) emprestada do pool do SQLAlchemy, já com os PRAGMAs
+    de configure_sqlite_pragmas; ao sair ela volta para o pool em vez de fechar.
+    """
+    conn = db.engine.raw_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def migration_lock():
+    """Lock de arquivo para que só um worker por vez rode as migrações de colunas"""
+    if not (fcntl or msvcrt):  # plataforma sem lock de arquivo: segue sem lock
+        yield
+        return
+    lock_path = f"{db.engine.url.database or 'sistema_os.db'}.migrate.lock"
+    with open(lock_path, "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            # LK_LOCK desiste após ~10 tentativas (OSError): insiste até obter o lock
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def add_missing_columns(conn, table, columns):
+    """Executa ALTER TABLE apenas para as colunas (nome, tipo) que ainda não existem"""
+    existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+    added = []
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+            added.append(name)
+    return added
+
 def bootstrap():
     # cria tabelas e admin/admin se não existir
     db.create_all()
     
     # Adicionar coluna ramal se não existir
     try:
-        db.session.execute(text('ALTER TABLE chamado ADD COLUMN ramal VARCHAR(20)'))
-        db.session.commit()
-        print("✅ Coluna 'ramal' adicionada na tabela 'chamado'")
+        with migration_lock(), db.engine.begin() as conn:
+            if add_missing_columns(conn, "chamado", [("ramal", "VARCHAR(20)")]):
+                print("✅ Coluna 'ramal' adicionada na tabela 'chamado'")
+            else:
+                print("✅ Coluna 'ramal' já existe na tabela 'chamado'")
     except Exception as e:
-        if "duplicate column name" in str(e) or "already exists" in str(e):
-            print("✅ Coluna 'ramal' já existe na tabela 'chamado'")
-        else:
-            print(f"⚠️ Erro ao adicionar coluna 'ramal': {e}")
-        db.session.rollback()
+        print(f"⚠️ Erro ao adicionar coluna 'ramal': {e}")
+    
+    # Índices de Chamado.__table_args__ (única definição): create_all não cria índices
+    # em tabelas que já existem, então bancos antigos os recebem aqui
+    try:
+        with migration_lock(), db.engine.begin() as conn:
+            for index in Chamado.__table__.indexes:
+                index.create(conn, checkfirst=True)
+    except Exception as e:
+        print(f"⚠️ Erro ao criar índices de chamado: {e}")
     
     if not User.query.filter_by(username="admin").first():
         u = User(username="admin", role="admin", setor=None)
@@ -266,6 +807,15 @@ class SystemSettings(db.Model):
     description = db.Column(db.Text, nullable=True)
     updated_at = db.Column(db.DateTime, default=now_brazil)
 
+# Permissões dos papéis embutidos (frozenset: verificação O(1))
+_OPERADOR_PERMS = frozenset({'view_tickets', 'update_tickets', 'create_tickets', 'view_sector', 'edit_sector', 'close_tickets', 'view_reports', 'edit_tickets', 'delete_tickets'})
+_USUARIO_PERMS = frozenset({'view_own_tickets', 'create_tickets', 'view_own'})
+_LEGACY_PERMS = {
+    'admin': frozenset({'view_all', 'edit_all', 'delete_all', 'manage_users', 'manage_sectors', 'manage_roles', 'view_reports', 'manage_settings', 'close_tickets', 'create_tickets', 'admin_access', 'edit_tickets', 'delete_tickets'}),
+    'operador': frozenset({'view_sector', 'edit_sector', 'close_tickets', 'create_tickets', 'view_reports', 'edit_tickets', 'delete_tickets'}),
+    'usuario': frozenset({'create_tickets', 'view_own'})
+}
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -274,13 +824,36 @@ class User(db.Model):
     setor = db.Column(db.String(50), nullable=True)  # legacy single sector - DEPRECATED
     # Sistema de roles simplificado usando campo string
     # New many-to-many relationship with sectors
-    sectors = db.relationship('Sector', secondary=user_sectors, backref='users', lazy=True)
+    sectors = db.relationship('Sector', secondary=user_sectors, backref='users', lazy='selectin')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        if password_hasher:
+            self.password_hash = password_hasher.hash(password)
+        else:
+            self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
+        """Verifica a senha (não altera o hash; ver needs_rehash)"""
+        if self.password_hash and self.password_hash.startswith('$argon2'):
+            if not password_hasher:
+                # argon2-cffi é dependência declarada; sem ele nenhum hash argon2 confere
+                app.logger.warning("argon2-cffi não instalado: impossível verificar a senha de '%s'", self.username)
+                return False
+            try:
+                password_hasher.verify(self.password_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+            return True
         return check_password_hash(self.password_hash, password)
+    
+    def needs_rehash(self):
+        """Hash antigo (werkzeug) ou argon2 com parâmetros desatualizados: regravar com set_password
+        após um check_password bem-sucedido (a rota de login faz isso e commita)"""
+        if not password_hasher:
+            return False
+        if not (self.password_hash and self.password_hash.startswith('$argon2')):
+            return True
+        return password_hasher.check_needs_rehash(self.password_hash)
         
     def has_permission(self, permission):
         """Check if user has specific permission"""
@@ -288,27 +861,20 @@ class User(db.Model):
             return True
             
         # Check custom roles from Role table FIRST (they take precedence)
-        custom_role = Role.query.filter_by(name=self.role, active=True).first()
-        if custom_role:
-            return custom_role.has_permission(permission)
+        custom_perms = _get_custom_role(self.role, roles_version())
+        if custom_perms is not None:
+            return permission in custom_perms
             
         # Check basic built-in roles
         if self.role == 'operador':
             # Operators can view and update tickets
-            return permission in ['view_tickets', 'update_tickets', 'create_tickets', 'view_sector', 'edit_sector', 'close_tickets', 'view_reports', 'edit_tickets', 'delete_tickets']
+            return permission in _OPERADOR_PERMS
         elif self.role == 'usuario':
             # Users can only view and create their own tickets
-            return permission in ['view_own_tickets', 'create_tickets', 'view_own']
+            return permission in _USUARIO_PERMS
         
         # Fallback to legacy role-based permissions for unknown roles
-        legacy_permissions = {
-            'admin': ['view_all', 'edit_all', 'delete_all', 'manage_users', 'manage_sectors', 'manage_roles', 'view_reports', 'manage_settings', 'close_tickets', 'create_tickets', 'admin_access', 'edit_tickets', 'delete_tickets'],
-            'operador': ['view_sector', 'edit_sector', 'close_tickets', 'create_tickets', 'view_reports', 'edit_tickets', 'delete_tickets'],
-            'usuario': ['create_tickets', 'view_own']
-        }
-        
-        role_perms = legacy_permissions.get(self.role, [])
-        return permission in role_perms
+        return permission in _LEGACY_PERMS.get(self.role, frozenset())
         
     def is_admin(self):
         """Check if user is admin (built-in admin or custom role with admin permissions)"""
@@ -342,8 +908,13 @@ class User(db.Model):
         return []
     
     def get_sector_names(self):
-        """Get list of sector names user has access to"""
-        return [s.name for s in self.get_sectors()]
+        """Get list of sector names user has access to (cached in the session for the logged user)"""
+        if not (has_request_context() and session.get('user_id') == self.id):
+            return [s.name for s in self.get_sectors()]
+        version = sectors_version()
+        if session.get('sectors_version') == version and 'sector_names' in session:
+            return session['sector_names']
+        return remember_user_sectors(self, [s.name for s in self.get_sectors()], version)
     
     def has_sector_access(self, sector_name):
         """Check if user has access to a specific sector"""
@@ -366,6 +937,18 @@ class User(db.Model):
             self.setor = None
 
 class Chamado(db.Model):
+    # Índices da listagem (paginação por cursor em index) e das estatísticas por status.
+    # Bancos existentes recebem estes mesmos índices em bootstrap(); o SQLite percorre
+    # o índice ao contrário para ORDER BY ... DESC, então não há versão DESC separada.
+    __table_args__ = (
+        db.Index('idx_chamado_criado_em', 'criado_em', 'id'),
+        db.Index('idx_chamado_setor_criado_em', 'setor', 'criado_em', 'id'),
+        db.Index('idx_chamado_usuario_criado_em', 'usuario_id', 'criado_em', 'id'),
+        db.Index('idx_chamado_status', 'status'),
+        # Relatórios/exportações: período + status/setor resolvidos no próprio índice
+        db.Index('idx_chamado_report', 'criado_em', 'status', 'setor'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(200), nullable=False)
     descricao = db.Column(db.Text, nullable=False)
@@ -391,12 +974,8 @@ class Chamado(db.Model):
     fechado_por = db.relationship("User", foreign_keys=[fechado_por_id])
     
     def get_images(self):
-        """Return list of image paths that exist"""
-        images = []
-        for img_field in [self.imagem1, self.imagem2, self.imagem3]:
-            if img_field:
-                images.append(img_field)
-        return images
+        """Return tuple of image paths that exist"""
+        return tuple(img for img in (self.imagem1, self.imagem2, self.imagem3) if img)
 
 class Role(db.Model):
     """Role model for advanced permissions system"""
@@ -415,17 +994,28 @@ class Role(db.Model):
         return f'<Role {self.name}: {self.display_name}>'
     
     def get_permissions(self):
-        """Return list of permissions"""
-        import json
+        """Return permissions as a frozenset (parsed once per permissions value)"""
+        cached = getattr(self, '_perm_cache', None)
+        if cached is not None and cached[0] == self.permissions:
+            return cached[1]
         try:
-            return json.loads(self.permissions) if self.permissions else []
-        except:
-            return []
+            perms = frozenset(json.loads(self.permissions or '[]'))
+        except ValueError:
+            # Papéis antigos gravados como CSV ('view_all,edit_all,...')
+            perms = frozenset(p.strip() for p in self.permissions.split(',') if p.strip())
+        self._perm_cache = (self.permissions, perms)
+        return perms
     
     def has_permission(self, permission):
         """Check if role has specific permission"""
-        perms = self.get_permissions()
-        return permission in perms
+        return permission in self.get_permissions()
+
+@lru_cache(maxsize=64)
+def _get_custom_role(role_name, version):
+    """Permissões (frozenset) do papel customizado ativo, ou None se não existir.
+    version = roles_version(); chamar bump_roles_version() sempre que papéis forem alterados."""
+    role = Role.query.filter_by(name=role_name, active=True).first()
+    return role.get_permissions() if role else None
 
 # -------------------- HELPERS DE AUTENTICAÇÃO --------------------
 def login_required(f):
@@ -444,6 +1034,7 @@ def login_required(f):
         
         if "user_id" not in session:
             return redirect(url_for("login"))
+        touch_session(session["user_id"])
         return f(*args, **kwargs)
     return wrapper
 
@@ -453,7 +1044,7 @@ def roles_required(*roles):
         def wrapper(*args, **kwargs):
             if "user_id" not in session:
                 return redirect(url_for("login"))
-            u = db.session.get(User, session["user_id"])
+            u = current_user()  # mesmo objeto (cacheado em g) usado depois pela view
             if not u or u.role not in roles:
                 return abort(403)
             return f(*args, **kwargs)
@@ -467,7 +1058,7 @@ def permission_required(*permissions):
         def wrapper(*args, **kwargs):
             if "user_id" not in session:
                 return redirect(url_for("login"))
-            u = db.session.get(User, session["user_id"])
+            u = current_user()  # mesmo objeto (cacheado em g) usado depois pela view
             if not u:
                 return abort(403)
             
@@ -484,14 +1075,19 @@ def permission_required(*permissions):
         return wrapper
     return deco
 
+# Consulta de fallback de current_user() construída uma única vez
+_USER_BASIC_SQL = text('SELECT id, username, password_hash, role FROM user WHERE id = :user_id')
+
 def current_user():
     if "user_id" in session:
+        # Memoizado por requisição em flask.g (decorators e views chamam várias vezes)
+        cached = g.get('_current_user')
+        if cached is not None and cached.id == session["user_id"]:
+            return cached
         try:
-            user = db.session.get(User, session["user_id"])
+            user = db.session.get(User, session["user_id"], options=[selectinload(User.sectors)])
             if user:
-                # Refresh user sectors in session for immediate effect
-                session['user_sectors'] = user.get_sector_names()
-                session['user_role'] = user.role
+                g._current_user = user
                 return user
         except Exception as e:
             print(f"Error getting current user: {e}")
@@ -499,7 +1095,7 @@ def current_user():
             try:
                 with db.engine.connect() as conn:
                     # Fallback query compatível com SQLite
-                    result = conn.execute(text('SELECT id, username, password_hash, role FROM user WHERE id = :user_id'), {"user_id": session["user_id"]})
+                    result = conn.execute(_USER_BASIC_SQL, {"user_id": session["user_id"]})
                     row = result.fetchone()
                     if row:
                         user = User()
@@ -507,6 +1103,7 @@ def current_user():
                         user.username = row[1] 
                         user.password_hash = row[2]
                         user.role = row[3]
+                        g._current_user = user
                         return user
             except Exception as e2:
                 print(f"Error with fallback query: {e2}")
@@ -516,52 +1113,33 @@ def current_user():
 
 def ensure_columns():
     # garante colunas 'setor' em user e chamado (SQLite) e novas colunas para admin menu
+    # Usa o engine do SQLAlchemy (mesmo banco e PRAGMAs da aplicação)
     try:
-        import sqlite3
-        db_path = os.path.join(app.root_path, "sistema_os.db")
-        if not os.path.exists(db_path):
-            db_path = "sistema_os.db"
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-        
-        # WAL mode uma vez apenas (persiste no arquivo)
-        try:
-            cur.execute("PRAGMA journal_mode=WAL")
-            print("✅ WAL mode configurado (persiste)")
-        except Exception as pragma_e:
-            print(f"⚠️ Erro ao configurar WAL: {pragma_e}")
-        
-        def has_col(table, col):
-            cur.execute(f'PRAGMA table_info({table})')
-            return any(r[1] == col for r in cur.fetchall())
-        
-        # Legacy columns
-        if not has_col("user", "setor"):
-            cur.execute("ALTER TABLE user ADD COLUMN setor VARCHAR(50)")
-        if not has_col("chamado", "setor"):
-            cur.execute("ALTER TABLE chamado ADD COLUMN setor VARCHAR(50)")
-        if not has_col("chamado", "usuario_setor"):
-            cur.execute("ALTER TABLE chamado ADD COLUMN usuario_setor VARCHAR(50)")
-        if not has_col("chamado", "urgencia"):
-            cur.execute("ALTER TABLE chamado ADD COLUMN urgencia VARCHAR(20)")
-            
-        # New columns for admin menu functionality
-        if not has_col("user", "role_id"):
-            cur.execute("ALTER TABLE user ADD COLUMN role_id INTEGER")
-        if not has_col("user", "active"):
-            cur.execute("ALTER TABLE user ADD COLUMN active BOOLEAN DEFAULT 1")
-        if not has_col("user", "created_at"):
-            cur.execute("ALTER TABLE user ADD COLUMN created_at DATETIME")
+        with migration_lock(), db.engine.begin() as conn:
+            # WAL mode uma vez apenas (persiste no arquivo)
+            try:
+                conn.execute(text("PRAGMA journal_mode=WAL"))
+                print("✅ WAL mode configurado (persiste)")
+            except Exception as pragma_e:
+                print(f"⚠️ Erro ao configurar WAL: {pragma_e}")
             
-        conn.commit()
-        conn.close()
+            # Legacy columns + new columns for admin menu functionality
+            add_missing_columns(conn, "user", [
+                ("setor", "VARCHAR(50)"),
+                ("role_id", "INTEGER"),
+                ("active", "BOOLEAN DEFAULT 1"),
+                ("created_at", "DATETIME"),
+            ])
+            add_missing_columns(conn, "chamado", [
+                ("setor", "VARCHAR(50)"),
+                ("usuario_setor", "VARCHAR(50)"),
+                ("urgencia", "VARCHAR(20)"),
+            ])
     except Exception as e:
         print("Aviso: não consegui garantir colunas de setor:", e)
 
 def configure_sqlite_pragmas():
     """Configurar PRAGMAs SQLite para produção via eventos SQLAlchemy"""
-    from sqlalchemy import event
-    
     @event.listens_for(db.engine, "connect")
     def set_sqlite_pragma(dbapi_connection, connection_record):
         try:
@@ -583,6 +1161,15 @@ def configure_sqlite_pragmas():
         except Exception as e:
             print(f"⚠️ Erro ao configurar PRAGMAs SQLite: {e}")
 
+# Statements do bootstrap compilados uma vez e executados com executemany
+_INSERT_DEFAULT_USER_SQL = text(
+    "INSERT OR IGNORE INTO user (username, password_hash, role) VALUES (:username, :password_hash, :role)"
+)
+_INSERT_DEFAULT_ROLE_SQL = text(
+    "INSERT OR IGNORE INTO role (name, display_name, description, permissions, active, created_at, updated_at) "
+    "VALUES (:name, :display_name, :description, :permissions, 1, :now, :now)"
+).bindparams(bindparam("now", type_=db.DateTime))
+
 def initialize_system():
     """Initialize database tables, default data, and migrate existing data"""
     with app.app_context():
@@ -593,65 +1180,52 @@ def initialize_system():
         # Then ensure columns exist with migration
         ensure_columns()
         
-        # Create default users with simple approach first
-        def ensure_user(username, role, pwd):
-            try:
-                # Check if user exists using raw SQL to avoid ORM issues
-                with db.engine.begin() as conn:
-                    result = conn.execute(text("SELECT COUNT(*) FROM user WHERE username = :username"), {"username": username})
-                    count = result.scalar()
-                    
-                    if count == 0:
-                        # Create user with basic columns
-                        conn.execute(text("INSERT INTO user (username, password_hash, role) VALUES (:username, :password_hash, :role)"), 
-                                   {"username": username, "password_hash": generate_password_hash(pwd), "role": role})
-                        print(f"Created user {username}")
-                    else:
-                        print(f"User {username} already exists")
-                        
-            except Exception as e:
-                print(f"Error creating user {username}: {e}")
-        
-        ensure_user("admin", "admin", "admin")
-        ensure_user("operador", "operador", "operador")
-        ensure_user("usuario", "usuario", "usuario")
-        
-        print("Basic users created successfully")
+        # Usuários padrão: um único INSERT OR IGNORE (username é UNIQUE) em uma transação
+        default_users = [("admin", "admin", "admin"), ("operador", "operador", "operador"), ("usuario", "usuario", "usuario")]
+        try:
+            with db.engine.begin() as conn:
+                # Só gera hash para quem ainda não existe (o hash de senha é a parte cara)
+                existing = set(conn.execute(
+                    text("SELECT username FROM user WHERE username IN ('admin', 'operador', 'usuario')")
+                ).scalars())
+                novos = [
+                    {"username": username, "password_hash": generate_password_hash(pwd), "role": role}
+                    for username, role, pwd in default_users if username not in existing
+                ]
+                if novos:
+                    conn.execute(_INSERT_DEFAULT_USER_SQL, novos)
+                    print(f"Created users: {', '.join(u['username'] for u in novos)}")
+            print("Basic users created successfully")
+        except Exception as e:
+            print(f"Error creating default users: {e}")
         
-        # Initialize custom roles
+        # Initialize custom roles (INSERT OR IGNORE: role.name é UNIQUE)
         try:
-            # Create semigerente role if it doesn't exist
-            semigerente = Role.query.filter_by(name='semigerente').first()
-            if not semigerente:
-                semigerente = Role(
-                    name='semigerente',
-                    display_name='Semi Gerente',
-                    description='Acesso completo a todas as funcionalidades',
-                    active=True,
-                    permissions='view_all,edit_all,delete_all,manage_users,manage_sectors,view_reports,manage_settings,close_tickets,create_tickets,admin_access,edit_tickets,delete_tickets,view_tickets,update_tickets,view_sector,edit_sector'
-                )
-                db.session.add(semigerente)
-                print("🔐 Papel 'semigerente' criado com todas as permissões")
-            
-            # Create semioperador role if it doesn't exist  
-            semioperador = Role.query.filter_by(name='semioperador').first()
-            if not semioperador:
-                semioperador = Role(
-                    name='semioperador',
-                    display_name='Semi Operador',
-                    description='Acesso somente a relatórios para visualização',
-                    active=True,
-                    permissions='view_reports,view_tickets,view_sector'
-                )
-                db.session.add(semioperador)
-                print("🔐 Papel 'semioperador' criado com permissões de relatórios")
-                
-            db.session.commit()
+            agora = now_brazil()
+            with db.engine.begin() as conn:
+                result = conn.execute(_INSERT_DEFAULT_ROLE_SQL, [
+                    {
+                        "name": 'semigerente',
+                        "display_name": 'Semi Gerente',
+                        "description": 'Acesso completo a todas as funcionalidades',
+                        "permissions": json.dumps(['view_all', 'edit_all', 'delete_all', 'manage_users', 'manage_sectors', 'view_reports', 'manage_settings', 'close_tickets', 'create_tickets', 'admin_access', 'edit_tickets', 'delete_tickets', 'view_tickets', 'update_tickets', 'view_sector', 'edit_sector']),
+                        "now": agora,
+                    },
+                    {
+                        "name": 'semioperador',
+                        "display_name": 'Semi Operador',
+                        "description": 'Acesso somente a relatórios para visualização',
+                        "permissions": json.dumps(['view_reports', 'view_tickets', 'view_sector']),
+                        "now": agora,
+                    },
+                ])
+            if result.rowcount:
+                print(f"🔐 {result.rowcount} papel(is) customizado(s) criado(s)")
+            bump_roles_version()
             print("Custom roles initialized successfully")
             
         except Exception as e:
             print(f"❌ Erro ao criar papéis customizados: {e}")
-            db.session.rollback()
 
 # Initialize system on import (disabled - using manual DB init)
 # initialize_system()
@@ -680,6 +1254,10 @@ def login():
         password = request.form.get("password","")
         user = User.query.filter_by(username=username).first()
         if user and user.check_password(password):
+            # Hash em formato antigo (werkzeug -> argon2) regravado no login
+            if user.needs_rehash():
+                user.set_password(password)
+                db.session.commit()
             # Check if user is active (disabled - column doesn't exist in current schema)
             # This check was causing SQL errors and reducing performance
             # Future: Add 'active' column if user activation/deactivation is needed
@@ -688,12 +1266,9 @@ def login():
             session["user_id"] = user.id
             
             # Rastrear usuário online
-            online_users.add(user.id)
-            user_sessions[user.id] = {
-                'login_time': datetime.now(),
-                'last_activity': datetime.now(),
-                'username': user.username
-            }
+            mark_user_online(user)
+            # Setores e papel calculados uma vez no login
+            remember_user_sectors(user)
             
             # Log da atividade
             if activity_logger:
@@ -710,10 +1285,8 @@ def logout():
     user_id = session.get("user_id")
     if user_id:
         # Remover usuário da lista de online
-        online_users.discard(user_id)
-        if user_id in user_sessions:
-            username = user_sessions[user_id].get('username', 'Usuário')
-            del user_sessions[user_id]
+        username = mark_user_offline(user_id)
+        if username:
             # Log da atividade
             if activity_logger:
                 log_logout(user_id, username)
@@ -722,6 +1295,125 @@ def logout():
     return redirect(url_for("login"))
 
 # -------------------- ROTAS PRINCIPAIS --------------------
+# Ordenação da listagem: (próxima ordem, rótulo, ícone)
+_SORT_OPTIONS = {
+    'desc': ('asc', 'Recentes Primeiro', 'bi bi-arrow-down'),
+    'asc': ('desc', 'Antigos Primeiro', 'bi bi-arrow-up'),
+}
+
+# Paginação por cursor (keyset) sobre (criado_em, id): cada página é um range scan
+# no índice, sem OFFSET nem COUNT(*). Expressões criadas uma vez para reaproveitar
+# o cache de statements compilados.
+_KEYSET_KEY = tuple_(Chamado.criado_em, Chamado.id)
+_KEYSET_ORDER = {
+    True: (Chamado.criado_em.desc(), Chamado.id.desc()),
+    False: (Chamado.criado_em.asc(), Chamado.id.asc()),
+}
+
+_CHAMADO_IMAGE_COLUMNS = (Chamado.imagem1, Chamado.imagem2, Chamado.imagem3)
+
+_INDEX_COLUMNS = load_only(
+    Chamado.id, Chamado.titulo, Chamado.status, Chamado.setor, Chamado.criado_em,
+    Chamado.fechado_em, Chamado.urgencia, Chamado.usuario_id, Chamado.fechado_por_id
+)
+
+def encode_cursor(chamado):
+    """Cursor opaco (base64) com a posição (criado_em, id) de um chamado (criado_em vazio se NULL)"""
+    ts = chamado.criado_em.isoformat() if chamado.criado_em else ''
+    raw = f"{ts}|{chamado.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Posição (criado_em, id) de um cursor (criado_em None para chamados legados sem data);
+    None se ausente ou inválido"""
+    if not cursor:
+        return None
+    try:
+        ts, cid = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return (datetime.fromisoformat(ts) if ts else None), int(cid)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def _keyset_items(query, position, descending, limit):
+    """
+    Até `limit` chamados depois de `position` na ordem (criado_em, id).
+    Chamados legados com criado_em NULL ficam no fim da ordem decrescente e no começo da
+    crescente (como o SQLite ordena NULL); a comparação de tuplas não os alcança, então
+    são lidos em um trecho à parte, ordenados por id. Cada trecho continua um range scan.
+    """
+    segments = [False, True] if descending else [True, False]  # True: trecho criado_em NULL
+    if position:
+        # Trechos anteriores ao do cursor já foram percorridos
+        segments = segments[segments.index(position[0] is None):]
+    items = []
+    for null_segment in segments:
+        q = query.filter(Chamado.criado_em.is_(None) if null_segment else Chamado.criado_em.isnot(None))
+        if position and (position[0] is None) == null_segment:
+            if null_segment:
+                q = q.filter(Chamado.id < position[1] if descending else Chamado.id > position[1])
+            else:
+                q = q.filter(_KEYSET_KEY < position if descending else _KEYSET_KEY > position)
+        items += q.order_by(*_KEYSET_ORDER[descending]).limit(limit - len(items)).all()
+        if len(items) >= limit:
+            break
+    return items
+
+def paginate_keyset(query, cursor, per_page, sort_order, backwards=False):
+    """
+    Retorna (itens, next_cursor, prev_cursor) a partir do cursor informado.
+    backwards=True busca a página anterior ao cursor (link "Anterior").
+    """
+    position = decode_cursor(cursor)
+    descending = (sort_order == 'desc') != backwards
+    # per_page + 1: a linha extra indica se existe mais uma página nessa direção
+    items = _keyset_items(query, position, descending, per_page + 1)
+    has_more = len(items) > per_page
+    del items[per_page:]
+    if backwards:
+        items.reverse()
+    if not items:
+        return items, None, None
+    has_next = position is not None if backwards else has_more
+    has_prev = has_more if backwards else position is not None
+    return (items,
+            encode_cursor(items[-1]) if has_next else None,
+            encode_cursor(items[0]) if has_prev else None)
+
+# Estatísticas do dashboard em cache por alguns segundos; as rotas de chamados
+# invalidam após o commit (alterações via API expiram pelo TTL)
+TICKET_STATS_TTL = 30
+_ticket_stats_cache = {'value': None, 'expires': 0.0}
+_ticket_stats_lock = threading.Lock()
+_TICKET_STATS_SQL = text("SELECT status, COUNT(*) FROM chamado GROUP BY status")
+
+def invalidate_ticket_stats():
+    """Descartar as estatísticas em cache (chamar após criar/alterar/excluir chamados)"""
+    with _ticket_stats_lock:
+        _ticket_stats_cache['expires'] = 0.0
+
+def compute_ticket_stats():
+    """Contagens de chamados por status para o dashboard (cache com TTL)"""
+    now = time.monotonic()
+    with _ticket_stats_lock:
+        if _ticket_stats_cache['expires'] > now:
+            return _ticket_stats_cache['value']
+    try:
+        # Uma única varredura do índice de status no lugar de quatro COUNT(*)
+        by_status = dict(db.session.execute(_TICKET_STATS_SQL).fetchall())
+        stats = {
+            'total': sum(by_status.values()),
+            'abertos': by_status.get('Aberto', 0),
+            'fechados': by_status.get('Fechado', 0),
+            'em_andamento': by_status.get('Em Andamento', 0)
+        }
+    except Exception as e:
+        print(f"Erro ao calcular estatísticas: {e}")
+        return None
+    with _ticket_stats_lock:
+        _ticket_stats_cache['value'] = stats
+        _ticket_stats_cache['expires'] = now + TICKET_STATS_TTL
+    return stats
+
 @app.route("/")
 @login_required
 def index():
@@ -733,87 +1425,56 @@ def index():
         return redirect(url_for("login"))
     
     # Paginação inteligente - Admin pode ver todos, mas de forma eficiente
-    page = request.args.get('page', 1, type=int)
-    per_page = int(request.args.get('per_page', 50))  # 50 por página é um bom equilíbrio
-    
-    # Permitir até 200 por página para admins que querem ver mais
-    if per_page > 200:
-        per_page = 200
+    # 50 por página é um bom equilíbrio; até 200 para admins que querem ver mais
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
     
     # Get sort parameter from URL (default: desc for newest first - mais útil)
     sort_order = request.args.get('sort', 'desc')
+    next_sort, sort_label, sort_icon = _SORT_OPTIONS.get(sort_order, _SORT_OPTIONS['asc'])
     
-    # Determine sort order (desc = mais recentes primeiro é melhor para admins)
-    if sort_order == 'desc':
-        order_by_clause = Chamado.criado_em.desc()
-        next_sort = 'asc'
-        sort_label = 'Recentes Primeiro'
-        sort_icon = 'bi bi-arrow-down'
-    else:
-        order_by_clause = Chamado.criado_em.asc()
-        next_sort = 'desc'
-        sort_label = 'Antigos Primeiro'
-        sort_icon = 'bi bi-arrow-up'
-    
-    # Optimize database queries with eager loading to prevent N+1 problems
-    base_query = Chamado.query.options(
-        joinedload(Chamado.usuario),
-        joinedload(Chamado.fechado_por)
-    )
+    # Só as colunas exibidas na listagem: descricao/resolucao (TEXT) e imagens ficam de fora.
+    # O template não usa relacionamentos (usuario/fechado_por): nada é carregado além da página
+    base_query = Chamado.query.options(_INDEX_COLUMNS)
+    # Em debug/testes qualquer relacionamento acessado pela listagem levanta erro
+    # em vez de cair em lazy load (uma consulta por linha); em produção fica desligado
+    if app.debug or app.testing:
+        base_query = base_query.options(raiseload('*'))
     
     # Aplicar filtros baseados no usuário
     if u.is_admin():
         # Admin sees all tickets - mas paginado para performance
-        query = base_query.order_by(order_by_clause)
+        query = base_query
     elif u.has_permission('view_all'):
         # Users with view_all permission (like semigerente) see all tickets
-        query = base_query.order_by(order_by_clause)
+        query = base_query
     elif u.is_operator_like():
         # Operators and operator-like roles see tickets from their assigned sectors only
         user_sector_names = u.get_sector_names()
         if user_sector_names:
-            query = base_query.filter(Chamado.setor.in_(user_sector_names)).order_by(order_by_clause)
+            query = base_query.filter(Chamado.setor.in_(user_sector_names))
         else:
             query = base_query.filter(Chamado.id == -1)  # Query that returns no results
     else:
         # Regular users see only their own tickets
-        query = base_query.filter_by(usuario_id=u.id).order_by(order_by_clause)
-    
-    # Executar paginação
-    pagination = query.paginate(
-        page=page, 
-        per_page=per_page, 
-        error_out=False,
-        max_per_page=200
-    )
+        query = base_query.filter_by(usuario_id=u.id)
     
-    chamados = pagination.items
+    # Executar paginação por cursor ('before' = voltar uma página)
+    before = request.args.get('before')
+    chamados, next_cursor, prev_cursor = paginate_keyset(
+        query, before or request.args.get('cursor'), per_page, sort_order, backwards=bool(before)
+    )
     
     # Estatísticas rápidas para o dashboard (só para admin)
     stats = None
     if u.is_admin() or u.has_permission('view_all'):
-        try:
-            # Usar índices criados para consultas rápidas
-            total = Chamado.query.count()
-            abertos = Chamado.query.filter_by(status='Aberto').count()
-            fechados = Chamado.query.filter_by(status='Fechado').count()
-            em_andamento = Chamado.query.filter_by(status='Em Andamento').count()
-            
-            stats = {
-                'total': total,
-                'abertos': abertos,
-                'fechados': fechados,
-                'em_andamento': em_andamento
-            }
-        except Exception as e:
-            print(f"Erro ao calcular estatísticas: {e}")
-            stats = None
+        stats = compute_ticket_stats()
     
     return render_template("index.html", 
                          app_name=APP_NAME, 
                          user=u, 
                          chamados=chamados,
-                         pagination=pagination,
+                         next_cursor=next_cursor,
+                         prev_cursor=prev_cursor,
                          stats=stats,
                          sort_order=sort_order,
                          next_sort=next_sort,
@@ -822,12 +1483,32 @@ def index():
                          per_page=per_page)
 
 # -------------------- USUÁRIOS (ADMIN) --------------------
+USERS_PER_PAGE = 50
+
 @app.route("/usuarios")
 @login_required
 @roles_required("admin")
 def usuarios_list():
-    users = User.query.order_by(User.username).all()
-    return render_template("usuarios_list.html", app_name=APP_NAME, user=current_user(), users=users)
+    # Paginação por cursor em username (UNIQUE) e só as colunas exibidas: sem
+    # hidratar objetos User nem carregar setores de todos os usuários
+    after = request.args.get('after')
+    before = request.args.get('before')
+    query = db.session.query(User.id, User.username, User.role)
+    if before:
+        query = query.filter(User.username < before).order_by(User.username.desc())
+    else:
+        if after:
+            query = query.filter(User.username > after)
+        query = query.order_by(User.username)
+    users = query.limit(USERS_PER_PAGE + 1).all()
+    has_more = len(users) > USERS_PER_PAGE
+    del users[USERS_PER_PAGE:]
+    if before:
+        users.reverse()
+    next_after = users[-1].username if users and (before or has_more) else None
+    prev_before = users[0].username if users and (has_more if before else after) else None
+    return render_template("usuarios_list.html", app_name=APP_NAME, user=current_user(), users=users,
+                           next_after=next_after, prev_before=prev_before)
 
 @app.route("/usuarios/novo", methods=["GET","POST"])
 @login_required
@@ -865,22 +1546,16 @@ def usuarios_novo():
         # Validate operator sector assignment
         if role == 'operador' and not u.get_sectors():
             flash("Operadores devem ter pelo menos um setor atribuído.", "warning")
-            # Buscar setores para o template
-            try:
-                sectors = Sector.query.filter_by(active=True).order_by(Sector.display_name).all()
-            except:
-                sectors = []
+            sectors = get_active_sectors()
             return render_template("usuarios_form.html", app_name=APP_NAME, user=current_user(), u=None, sectors=sectors)
         
         db.session.commit()
+        # Invalidar setores/usuários em cache (sessões e listas de filtros)
+        bump_sectors_version()
         flash("Usuário criado.", "success")
         return redirect(url_for("usuarios_list"))
     
-    # Buscar setores para o template
-    try:
-        sectors = Sector.query.filter_by(active=True).order_by(Sector.display_name).all()
-    except:
-        sectors = []
+    sectors = get_active_sectors()
     return render_template("usuarios_form.html", app_name=APP_NAME, user=current_user(), u=None, sectors=sectors)
 
 @app.route("/usuarios/editar/<int:user_id>", methods=["GET","POST"])
@@ -915,30 +1590,19 @@ def usuarios_editar(user_id):
         # Validate operator sector assignment
         if u.is_operator_like() and not u.is_admin() and not u.get_sectors():
             flash("Operadores devem ter pelo menos um setor atribuído.", "warning")
-            # Buscar setores para o template
-            try:
-                sectors = Sector.query.filter_by(active=True).order_by(Sector.display_name).all()
-            except:
-                sectors = []
+            sectors = get_active_sectors()
             return render_template("usuarios_form.html", app_name=APP_NAME, user=current_user(), u=u, sectors=sectors)
         
         if new_pwd:
             u.set_password(new_pwd)
         
-        # Force session refresh for currently logged in user
-        if u.id == session.get('user_id'):
-            session['user_sectors'] = u.get_sector_names()
-            session['user_role'] = u.role
-        
         db.session.commit()
+        # Invalidar setores cacheados nas sessões (deste e dos demais usuários)
+        bump_sectors_version()
         flash("Usuário atualizado.", "success")
         return redirect(url_for("usuarios_list"))
     
-    # Buscar setores para o template
-    try:
-        sectors = Sector.query.filter_by(active=True).order_by(Sector.display_name).all()
-    except:
-        sectors = []
+    sectors = get_active_sectors()
     return render_template("usuarios_form.html", app_name=APP_NAME, user=current_user(), u=u, sectors=sectors)
 
 @app.route("/usuarios/excluir/<int:user_id>")
@@ -951,6 +1615,7 @@ def usuarios_excluir(user_id):
     u = db.session.get(User, user_id) or abort(404)
     db.session.delete(u)
     db.session.commit()
+    bump_sectors_version()
     flash("Usuário excluído.", "success")
     return redirect(url_for("usuarios_list"))
 
@@ -960,6 +1625,7 @@ def usuarios_excluir(user_id):
 def chamados_novo():
     u = current_user()
     if request.method == "POST":
+        request.max_content_length = TICKET_FORM_MAX_LENGTH
         titulo = request.form["titulo"].strip()
         descricao = request.form["descricao"].strip()
         if not titulo or not descricao:
@@ -974,7 +1640,7 @@ def chamados_novo():
         
         # Validação CDC para setor COMPRAS
         setor_selecionado = request.form.get('setor', '').strip()
-        if setor_selecionado and ('COMPRAS' in setor_selecionado.upper() or 'COMPRA' in setor_selecionado.upper()):
+        if is_compras_sector(setor_selecionado):
             if not cdc:
                 flash("Para o setor COMPRAS é obrigatório informar o CDC. Caso não tenha na sua OS, a mesma será invalidada.", "error")
                 return redirect(url_for("chamados_novo"))
@@ -982,31 +1648,31 @@ def chamados_novo():
         c = Chamado(titulo=titulo, descricao=descricao, usuario_id=u.id, status="Aberto", setor=request.form.get('setor'), usuario_setor=usuario_setor, ramal=ramal, cdc=cdc)
         
         # Handle image uploads
-        for i in range(1, 4):  # imagem1, imagem2, imagem3
-            file = request.files.get(f'imagem{i}')
-            if file:
-                filename = save_uploaded_file(file)
-                if filename:
-                    setattr(c, f'imagem{i}', filename)
+        # Imagem acima do limite recusa o chamado inteiro (e apaga as já gravadas)
+        saved = []
+        try:
+            for i in range(1, 4):  # imagem1, imagem2, imagem3
+                file = request.files.get(f'imagem{i}')
+                if file:
+                    filename = save_uploaded_file(file)
+                    if filename:
+                        saved.append(filename)
+                        setattr(c, f'imagem{i}', filename)
+        except UploadTooLarge as e:
+            remove_uploaded_files(saved)
+            flash(str(e), "error")
+            return redirect(url_for("chamados_novo"))
         
         db.session.add(c)
         db.session.commit()
+        invalidate_ticket_stats()
         # Emit WebSocket event for new ticket
         emit_ticket_update(ticket_to_dict(c), 'created')
         flash("Chamado criado.", "success")
         return redirect(url_for("index"))
     
     # Get dynamic sectors for the form
-    try:
-        sectors = Sector.query.filter_by(active=True).order_by(Sector.display_name).all()
-    except:
-        # Fallback to default sectors if table doesn't exist yet
-        sectors = [
-            {'name': 'ti', 'display_name': 'T.I'},
-            {'name': 'manutencao', 'display_name': 'Manutenção'},
-            {'name': 'ccih', 'display_name': 'CCIH / SESMT / Manutenção de Ar condicionado'},
-            {'name': 'telefonia', 'display_name': 'Telefonia e outros serviços'}
-        ]
+    sectors = get_active_sectors(_DEFAULT_SECTOR_OPTIONS)
     
     return render_template("chamado_form.html", app_name=APP_NAME, user=u, chamado=None, sectors=sectors)
 
@@ -1019,6 +1685,7 @@ def chamados_editar(cid):
     if not u.is_admin():
         abort(403)
     if request.method == "POST":
+        request.max_content_length = TICKET_FORM_MAX_LENGTH
         old_status = c.status
         c.titulo = request.form["titulo"].strip()
         c.descricao = request.form["descricao"].strip()
@@ -1033,49 +1700,47 @@ def chamados_editar(cid):
         c.cdc = cdc
         
         # Validação CDC para setor COMPRAS na edição
-        if c.setor and ('COMPRAS' in c.setor.upper() or 'COMPRA' in c.setor.upper()):
+        if is_compras_sector(c.setor):
             if not cdc:
                 flash("Para o setor COMPRAS é obrigatório informar o CDC. Caso não tenha na sua OS, a mesma será invalidada.", "error")
                 # Get dynamic sectors for the form in case of error
-                try:
-                    sectors = Sector.query.filter_by(active=True).order_by(Sector.display_name).all()
-                except:
-                    sectors = [
-                        {'name': 'ti', 'display_name': 'T.I'},
-                        {'name': 'manutencao', 'display_name': 'Manutenção'},
-                        {'name': 'ccih', 'display_name': 'CCIH / SESMT / Manutenção de Ar condicionado'},
-                        {'name': 'telefonia', 'display_name': 'Telefonia e outros serviços'}
-                    ]
+                sectors = get_active_sectors(_DEFAULT_SECTOR_OPTIONS)
                 return render_template("chamado_form.html", app_name=APP_NAME, user=u, chamado=c, sectors=sectors)
         
         # Handle image uploads and removals
-        for i in range(1, 4):  # imagem1, imagem2, imagem3
-            # Check if user wants to remove existing image
-            if request.form.get(f'remover_imagem{i}'):
-                old_image = getattr(c, f'imagem{i}')
-                if old_image:
-                    # Delete file from filesystem
-                    try:
-                        os.remove(os.path.join(UPLOAD_FOLDER, old_image))
-                    except:
-                        pass  # File might not exist
-                setattr(c, f'imagem{i}', None)
-            
-            # Handle new image upload
-            file = request.files.get(f'imagem{i}')
-            if file:
-                filename = save_uploaded_file(file)
-                if filename:
-                    # Remove old image if replacing
+        # Arquivos antigos só são apagados depois do commit (em background)
+        to_delete = []
+        saved = []
+        try:
+            for i in range(1, 4):  # imagem1, imagem2, imagem3
+                # Check if user wants to remove existing image
+                if request.form.get(f'remover_imagem{i}'):
                     old_image = getattr(c, f'imagem{i}')
                     if old_image:
-                        try:
-                            os.remove(os.path.join(UPLOAD_FOLDER, old_image))
-                        except:
-                            pass
-                    setattr(c, f'imagem{i}', filename)
+                        to_delete.append(old_image)
+                    setattr(c, f'imagem{i}', None)
+                
+                # Handle new image upload
+                file = request.files.get(f'imagem{i}')
+                if file:
+                    filename = save_uploaded_file(file)
+                    if filename:
+                        saved.append(filename)
+                        # Remove old image if replacing
+                        old_image = getattr(c, f'imagem{i}')
+                        if old_image:
+                            to_delete.append(old_image)
+                        setattr(c, f'imagem{i}', filename)
+        except UploadTooLarge as e:
+            # Nada é gravado: descarta as alterações e as imagens novas já salvas
+            db.session.rollback()
+            remove_uploaded_files(saved)
+            flash(str(e), "error")
+            return redirect(url_for("chamados_editar", cid=cid))
         
         db.session.commit()
+        remove_uploaded_files(to_delete)
+        invalidate_ticket_stats()
         # Emit WebSocket event for ticket update
         event_type = 'status_changed' if old_status != c.status else 'updated'
         emit_ticket_update(ticket_to_dict(c), event_type)
@@ -1083,16 +1748,7 @@ def chamados_editar(cid):
         return redirect(url_for("index"))
     
     # Get dynamic sectors for the form
-    try:
-        sectors = Sector.query.filter_by(active=True).order_by(Sector.display_name).all()
-    except:
-        # Fallback to default sectors if table doesn't exist yet
-        sectors = [
-            {'name': 'ti', 'display_name': 'T.I'},
-            {'name': 'manutencao', 'display_name': 'Manutenção'},
-            {'name': 'ccih', 'display_name': 'CCIH / SESMT / Manutenção de Ar condicionado'},
-            {'name': 'telefonia', 'display_name': 'Telefonia e outros serviços'}
-        ]
+    sectors = get_active_sectors(_DEFAULT_SECTOR_OPTIONS)
     
     return render_template("chamado_form.html", app_name=APP_NAME, user=u, chamado=c, sectors=sectors)
 
@@ -1118,6 +1774,7 @@ def chamados_fechar(cid):
         c.urgencia = urgencia
         c.fechado_por_id = u.id
         db.session.commit()
+        invalidate_ticket_stats()
         # Emit WebSocket event for ticket closure
         emit_ticket_update(ticket_to_dict(c), 'closed')
         flash("Chamado fechado.", "success")
@@ -1128,12 +1785,17 @@ def chamados_fechar(cid):
 @login_required
 def chamados_excluir(cid):
     u = current_user()
-    c = db.session.get(Chamado, cid) or abort(404)
     # apenas admin pode excluir
     if not u.is_admin():
         abort(403)
+    # Exclusão pelo ORM (cascatas e limpeza de relacionamentos continuam valendo), carregando
+    # só a PK e os anexos: as imagens do chamado são removidas do disco após o commit
+    c = db.session.get(Chamado, cid, options=[load_only(Chamado.id, *_CHAMADO_IMAGE_COLUMNS)]) or abort(404)
+    images = [getattr(c, col.key) for col in _CHAMADO_IMAGE_COLUMNS if getattr(c, col.key)]
     db.session.delete(c)
     db.session.commit()
+    remove_uploaded_files(images)
+    invalidate_ticket_stats()
     flash("Chamado excluído.", "success")
     return redirect(url_for("index"))
 
@@ -1166,7 +1828,10 @@ def admin_backup():
     if not os.path.exists(db_path):
         flash("Banco de dados não encontrado.", "danger")
         return redirect(url_for("index"))
-    return send_file(db_path, as_attachment=True, download_name="sistema_os_backup.sqlite")
+    # conditional: suporta Range/If-Modified-Since; max_age=0 para o navegador não
+    # reaproveitar um backup antigo (o padrão de send_file é o cache de 1 ano)
+    return send_file(db_path, as_attachment=True, download_name="sistema_os_backup.sqlite",
+                     conditional=True, max_age=0)
 
 # -------------------- DATABASE MANAGEMENT --------------------
 @app.route("/admin/database/export")
@@ -1176,7 +1841,6 @@ def admin_database_export():
     """Exportar banco de dados principal"""
     try:
         # Criar backup antes da exportação
-        from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         db_path = "sistema_os.db"
@@ -1187,7 +1851,8 @@ def admin_database_export():
         # Nome do arquivo com timestamp
         download_name = f"sistema_os_export_{timestamp}.db"
         
-        return send_file(db_path, as_attachment=True, download_name=download_name, mimetype='application/x-sqlite3')
+        return send_file(db_path, as_attachment=True, download_name=download_name, mimetype='application/x-sqlite3',
+                         conditional=True, max_age=0)
     except Exception as e:
         flash(f"Erro ao exportar banco de dados: {str(e)}", "danger")
         return redirect(url_for("admin_settings"))
@@ -1221,21 +1886,24 @@ def admin_database_import():
             return redirect(url_for("admin_settings"))
         
         # Criar backup do banco atual antes da importação
-        from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = f"backup_before_import_{timestamp}.db"
         
-        import shutil
         if os.path.exists("sistema_os.db"):
-            shutil.copy2("sistema_os.db", backup_path)
+            # Hard link evita copiar o banco inteiro; o arquivo original é
+            # substituído por rename, então o link continua com o conteúdo antigo
+            try:
+                os.link("sistema_os.db", backup_path)
+            except OSError:
+                shutil.copy2("sistema_os.db", backup_path)
             print(f"Backup criado: {backup_path}")
         
-        # Salvar arquivo temporário
+        # Gravar arquivo temporário em blocos direto do stream do upload
         temp_path = f"temp_import_{timestamp}.db"
-        file.save(temp_path)
+        with open(temp_path, 'wb') as out:
+            shutil.copyfileobj(file.stream, out, length=4 << 20)
         
         # Validar se é um banco SQLite válido
-        import sqlite3
         try:
             test_conn = sqlite3.connect(temp_path)
             test_conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
@@ -1249,16 +1917,15 @@ def admin_database_import():
         db.session.close()
         db.engine.dispose()
         
-        # Substituir banco atual
-        if os.path.exists("sistema_os.db"):
-            os.remove("sistema_os.db")
-        
-        shutil.move(temp_path, "sistema_os.db")
+        # Substituir banco atual (rename atômico, sem janela sem arquivo)
+        os.replace(temp_path, "sistema_os.db")
         
         # Recriar conexão
-        from sqlalchemy import create_engine
         app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///sistema_os.db'
         db.engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+        bump_roles_version()
+        invalidate_ticket_stats()
+        bump_sectors_version()
         
         flash(f"Banco de dados importado com sucesso! Backup salvo como: {backup_path}", "success")
         
@@ -1298,7 +1965,7 @@ def admin_monitoring():
         db_stats = get_database_stats()
         
         # Usuários online
-        online_count = len(online_users)
+        online_count = len(get_online_users())
         
         # Atividades recentes
         recent_activities = []
@@ -1329,14 +1996,38 @@ def admin_monitoring_data():
             recent_activities = activity_logger.get_recent_activities(10)
         
         data = {
-            'online_users': len(online_users),
+            'online_users': len(get_online_users()),
             'recent_activities': recent_activities,
             'timestamp': datetime.now().strftime('%H:%M:%S')
         }
         
-        return json.dumps(data)
+        return jsonify(data)
     except Exception as e:
-        return json.dumps({'error': str(e)})
+        return jsonify({'error': str(e)})
+
+# Último backup (caminho, ctime) em cache: backups são gravados raramente
+BACKUP_SCAN_TTL = 60
+_latest_backup_cache = {'value': None, 'expires': 0.0}
+
+def get_latest_backup():
+    """(caminho, ctime) do backup .db mais recente em backups/, ou None"""
+    now = time.monotonic()
+    if _latest_backup_cache['expires'] > now:
+        return _latest_backup_cache['value']
+    # Uma passada com os.scandir: o stat de cada DirEntry é reaproveitado
+    latest = None
+    try:
+        with os.scandir("backups") as it:
+            for entry in it:
+                if entry.name.endswith(".db"):
+                    ct = entry.stat().st_ctime
+                    if latest is None or ct > latest[1]:
+                        latest = (entry.path, ct)
+    except FileNotFoundError:
+        pass
+    _latest_backup_cache['value'] = latest
+    _latest_backup_cache['expires'] = now + BACKUP_SCAN_TTL
+    return latest
 
 def get_system_status():
     """Obter status geral do sistema"""
@@ -1353,7 +2044,7 @@ def get_system_status():
     
     try:
         # Verificar conexão do banco
-        result = db.session.execute(text("SELECT 1")).fetchone()
+        result = db.session.execute(_PING_SQL).fetchone()
         if not result:
             status['db_status'] = 'Erro'
             status['db_status_color'] = 'danger'
@@ -1368,11 +2059,9 @@ def get_system_status():
     
     # Verificar último backup
     try:
-        import glob
-        backup_files = glob.glob("backups/*.db")
-        if backup_files:
-            latest_backup = max(backup_files, key=os.path.getctime)
-            backup_time = datetime.fromtimestamp(os.path.getctime(latest_backup))
+        latest_backup = get_latest_backup()
+        if latest_backup:
+            backup_time = datetime.fromtimestamp(latest_backup[1])
             hours_ago = (datetime.now() - backup_time).total_seconds() / 3600
             
             if hours_ago < 24:
@@ -1391,6 +2080,37 @@ def get_system_status():
     
     return status
 
+# Amostrador de CPU/memória/disco em thread daemon: cpu_percent(interval=1) bloqueia
+# por 1s, então só o amostrador espera; as requisições leem a última amostra
+PERF_SAMPLE_INTERVAL = 2
+_latest_perf = None
+_perf_ready = threading.Event()
+_perf_sampler_lock = threading.Lock()
+_perf_sampler_started = False
+
+def _perf_sampler():
+    global _latest_perf
+    while True:
+        try:
+            _latest_perf = {
+                'cpu': psutil.cpu_percent(interval=1.0),
+                'mem': psutil.virtual_memory().percent,
+                'disk': psutil.disk_usage('/').percent,
+            }
+            _perf_ready.set()
+        except Exception as e:
+            print(f"Erro ao obter performance: {e}")
+        time.sleep(PERF_SAMPLE_INTERVAL)
+
+def start_perf_sampler():
+    """Iniciar o amostrador (uma vez por processo)"""
+    global _perf_sampler_started
+    with _perf_sampler_lock:
+        if _perf_sampler_started:
+            return
+        _perf_sampler_started = True
+    threading.Thread(target=_perf_sampler, name='perf-sampler', daemon=True).start()
+
 def get_system_performance():
     """Obter métricas de performance do sistema"""
     performance = {
@@ -1402,36 +2122,59 @@ def get_system_performance():
         'disk_color': 'success'
     }
     
-    try:
-        # CPU
-        cpu = psutil.cpu_percent(interval=1)
-        performance['cpu_percent'] = round(cpu, 1)
-        if cpu > 80:
-            performance['cpu_color'] = 'danger'
-        elif cpu > 60:
-            performance['cpu_color'] = 'warning'
-        
-        # Memória
-        memory = psutil.virtual_memory()
-        performance['memory_percent'] = round(memory.percent, 1)
-        if memory.percent > 80:
-            performance['memory_color'] = 'danger'
-        elif memory.percent > 60:
-            performance['memory_color'] = 'warning'
-        
-        # Disco
-        disk = psutil.disk_usage('/')
-        performance['disk_percent'] = round(disk.percent, 1)
-        if disk.percent > 90:
-            performance['disk_color'] = 'danger'
-        elif disk.percent > 80:
-            performance['disk_color'] = 'warning'
-            
-    except Exception as e:
-        print(f"Erro ao obter performance: {e}")
+    start_perf_sampler()
+    # Só a primeira consulta do processo espera pela primeira amostra
+    _perf_ready.wait(timeout=1.5)
+    sample = _latest_perf
+    if not sample:
+        return performance
+    
+    # CPU
+    cpu = sample['cpu']
+    performance['cpu_percent'] = round(cpu, 1)
+    if cpu > 80:
+        performance['cpu_color'] = 'danger'
+    elif cpu > 60:
+        performance['cpu_color'] = 'warning'
+    
+    # Memória
+    memory = sample['mem']
+    performance['memory_percent'] = round(memory, 1)
+    if memory > 80:
+        performance['memory_color'] = 'danger'
+    elif memory > 60:
+        performance['memory_color'] = 'warning'
+    
+    # Disco
+    disk = sample['disk']
+    performance['disk_percent'] = round(disk, 1)
+    if disk > 90:
+        performance['disk_color'] = 'danger'
+    elif disk > 80:
+        performance['disk_color'] = 'warning'
     
     return performance
 
+# Statements de contagem construídos uma vez e reutilizados a cada requisição
+# (whitelist de tabelas -> text() pré-construído; nunca montar SQL com f-string)
+_COUNT_SQL = {
+    'user': text("SELECT COUNT(*) FROM user"),
+    'chamado': text("SELECT COUNT(*) FROM chamado"),
+}
+_COUNT_ADMIN_USERS_SQL = text("SELECT COUNT(*) FROM user WHERE role = 'admin'")
+_COUNT_CHAMADOS_ABERTOS_SQL = text("SELECT COUNT(*) FROM chamado WHERE status = 'aberto'")
+_PING_SQL = text("SELECT 1")
+
+_DB_STATS_SQL = text(
+    "SELECT (SELECT COUNT(*) FROM user), (SELECT COUNT(*) FROM chamado), "
+    "(SELECT COUNT(*) FROM system_activity), "
+    "(SELECT COUNT(*) FROM chamado WHERE status != 'fechado')"
+)
+_DB_STATS_NO_ACTIVITY_SQL = text(
+    "SELECT (SELECT COUNT(*) FROM user), (SELECT COUNT(*) FROM chamado), "
+    "(SELECT COUNT(*) FROM chamado WHERE status != 'fechado')"
+)
+
 def get_database_stats():
     """Obter estatísticas do banco de dados"""
     stats = {
@@ -1442,48 +2185,72 @@ def get_database_stats():
     }
     
     try:
+        # Todas as contagens em um único statement
+        try:
+            users, chamados, activities, active = db.session.execute(_DB_STATS_SQL).fetchone()
+        except Exception:
+            # system_activity pode não existir (activity logger desativado)
+            db.session.rollback()
+            users, chamados, active = db.session.execute(_DB_STATS_NO_ACTIVITY_SQL).fetchone()
+            activities = 0
+        
         # Total de registros
-        tables = ['user', 'chamado', 'system_activity']
-        total = 0
-        for table in tables:
-            try:
-                result = db.session.execute(text(f"SELECT COUNT(*) FROM {table}")).fetchone()
-                if result:
-                    total += result[0]
-            except:
-                pass
-        stats['total_records'] = total
+        stats['total_records'] = users + chamados + activities
         
         # Tamanho do banco
-        if os.path.exists("sistema_os.db"):
-            size_bytes = os.path.getsize("sistema_os.db")
+        try:
+            size_bytes = os.stat("sistema_os.db").st_size
             size_mb = round(size_bytes / (1024 * 1024), 2)
             stats['db_size'] = f"{size_mb} MB"
+        except FileNotFoundError:
+            pass
         
         # Chamados ativos
-        result = db.session.execute(text("SELECT COUNT(*) FROM chamado WHERE status != 'fechado'")).fetchone()
-        if result:
-            stats['active_tickets'] = result[0]
+        stats['active_tickets'] = active
         
         # Total de usuários
-        result = db.session.execute(text("SELECT COUNT(*) FROM user")).fetchone()
-        if result:
-            stats['total_users'] = result[0]
+        stats['total_users'] = users
             
     except Exception as e:
         print(f"Erro ao obter estatísticas do banco: {e}")
     
     return stats
 
+# Contagem de logs "orçada": acima disso a tela mostra "5000+" em vez de contar tudo
+LOG_COUNT_BUDGET = 5000
+
+# Colunas exibidas na tela de logs (id e timestamp primeiro: formam o cursor)
+_LOG_COLUMNS = "id, timestamp, username, action_type, action_description, details, ip_address"
+_LOG_COLUMNS_L = ", ".join(f"l.{col}" for col in _LOG_COLUMNS.split(", "))
+
+def encode_log_cursor(row):
+    """Cursor opaco (base64) com a posição (timestamp, id) de uma linha de log"""
+    raw = f"{row[1]}|{row[0]}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_log_cursor(cursor):
+    """Posição (timestamp, id) de um cursor de log; None se ausente ou inválido"""
+    if not cursor:
+        return None
+    try:
+        ts, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return ts, int(log_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
 @app.route("/admin/logs")
 @login_required
 @roles_required("admin")
 def admin_logs():
     """Página de logs de atividades"""
     try:
-        # Paginação
-        page = request.args.get('page', 1, type=int)
+        # Paginação por cursor (timestamp, id); "page" é só o número exibido
+        page = max(request.args.get('page', 1, type=int), 1)
         per_page = 50
+        after = decode_log_cursor(request.args.get('after'))
+        before = decode_log_cursor(request.args.get('before'))
+        # COUNT(*) só sob demanda (link "contar"); a paginação usa a sonda per_page + 1
+        show_total = request.args.get('total') == '1'
         
         # Filtros
         action_filter = request.args.get('action', '')
@@ -1492,54 +2259,94 @@ def admin_logs():
         
         # Obter logs com filtros
         logs = []
-        total_logs = 0
+        has_logs = False
+        total_logs = None
+        total_capped = False
+        has_next = False
+        has_prev = page > 1
+        next_cursor = prev_cursor = None
         
         if activity_logger:
-            # Implementar filtros na consulta
-            conn = sqlite3.connect("sistema_os.db")
-            cursor = conn.cursor()
-            
-            query = "SELECT * FROM system_activity WHERE 1=1"
+            # Implementar filtros na consulta (executada na conexão persistente do
+            # activity logger: o mesmo arquivo em que os logs são gravados)
+            where = " WHERE 1=1"
             params = []
             
             if action_filter:
-                query += " AND action_type LIKE ?"
+                where += " AND action_type LIKE ?"
                 params.append(f'%{action_filter}%')
             
             if user_filter:
-                query += " AND username LIKE ?"
+                where += " AND username LIKE ?"
                 params.append(f'%{user_filter}%')
             
             if date_filter:
-                query += " AND DATE(timestamp) = ?"
-                params.append(date_filter)
-            
-            # Contar total
-            count_query = query.replace("SELECT *", "SELECT COUNT(*)")
-            cursor.execute(count_query, params)
-            total_logs = cursor.fetchone()[0]
+                # Intervalo [dia, dia + 1) em vez de DATE(timestamp) = ?: permite usar o
+                # índice de timestamp (idx_activity_ts_id) em vez de varrer a tabela
+                try:
+                    dia = datetime.strptime(date_filter, '%Y-%m-%d')
+                    where += " AND timestamp >= ? AND timestamp < ?"
+                    params.extend([dia.strftime('%Y-%m-%d'), (dia + timedelta(days=1)).strftime('%Y-%m-%d')])
+                except ValueError:
+                    where += " AND DATE(timestamp) = ?"
+                    params.append(date_filter)
             
-            # Buscar logs paginados
-            query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
-            params.extend([per_page, (page - 1) * per_page])
+            # Contar total (apenas quando solicitado), limitado a LOG_COUNT_BUDGET linhas
+            if show_total:
+                total_logs = activity_logger.query(
+                    f"SELECT COUNT(*) FROM (SELECT 1 FROM system_activity{where} LIMIT ?)",
+                    params + [LOG_COUNT_BUDGET + 1])[0][0]
+                if total_logs > LOG_COUNT_BUDGET:
+                    total_logs = LOG_COUNT_BUDGET
+                    total_capped = True
             
-            cursor.execute(query, params)
-            raw_logs = cursor.fetchall()
+            # Buscar a página (+1 linha para saber se existe mais uma página nessa direção)
+            if before:
+                # "Anterior": linhas mais recentes que o cursor, lidas em ordem crescente
+                raw_logs = activity_logger.query(
+                    f"SELECT {_LOG_COLUMNS} FROM system_activity{where} AND (timestamp, id) > (?, ?) "
+                    "ORDER BY timestamp ASC, id ASC LIMIT ?",
+                    params + [*before, per_page + 1])
+                has_prev = len(raw_logs) > per_page
+                del raw_logs[per_page:]
+                raw_logs.reverse()
+                has_next = True
+            elif after or page == 1:
+                if after:
+                    where += " AND (timestamp, id) < (?, ?)"
+                    params.extend(after)
+                raw_logs = activity_logger.query(
+                    f"SELECT {_LOG_COLUMNS} FROM system_activity{where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                    params + [per_page + 1])
+                has_next = len(raw_logs) > per_page
+                del raw_logs[per_page:]
+            else:
+                # Salto direto para ?page=N (links antigos): o OFFSET percorre apenas
+                # os ids no índice e só as linhas da página são lidas por inteiro
+                raw_logs = activity_logger.query(
+                    f"SELECT {_LOG_COLUMNS_L} FROM system_activity l JOIN ("
+                    f"SELECT id FROM system_activity{where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+                    ") k USING(id) ORDER BY l.timestamp DESC, l.id DESC",
+                    params + [per_page + 1, (page - 1) * per_page])
+                has_next = len(raw_logs) > per_page
+                del raw_logs[per_page:]
             
-            # Formatar logs
-            for log in raw_logs:
-                logs.append({
-                    'id': log[0],
-                    'timestamp': activity_logger.format_timestamp(log[1]),
-                    'user': log[3] or 'Sistema',
-                    'action': log[4],
-                    'description': log[5],
-                    'details': log[6],
-                    'ip': log[7],
-                    'color': activity_logger.get_action_color(log[4])
-                })
+            if raw_logs:
+                next_cursor = encode_log_cursor(raw_logs[-1])
+                prev_cursor = encode_log_cursor(raw_logs[0])
             
-            conn.close()
+            # Formatar logs sob demanda durante a renderização (sem segunda lista de dicts)
+            logs = ({
+                'id': log[0],
+                'timestamp': activity_logger.format_timestamp(log[1]),
+                'user': log[2] or 'Sistema',
+                'action': log[3],
+                'description': log[4],
+                'details': log[5],
+                'ip': log[6],
+                'color': activity_logger.get_action_color(log[3])
+            } for log in raw_logs)
+            has_logs = bool(raw_logs)
         
         # Estatísticas rápidas
         stats = activity_logger.get_activity_stats() if activity_logger else {}
@@ -1548,7 +2355,13 @@ def admin_logs():
                              app_name=APP_NAME,
                              user=current_user(),
                              logs=logs,
+                             has_logs=has_logs,
                              total_logs=total_logs,
+                             total_capped=total_capped,
+                             has_next=has_next,
+                             has_prev=has_prev,
+                             next_cursor=next_cursor,
+                             prev_cursor=prev_cursor,
                              page=page,
                              per_page=per_page,
                              action_filter=action_filter,
@@ -1560,6 +2373,35 @@ def admin_logs():
         flash(f"Erro ao carregar logs: {str(e)}", "danger")
         return redirect(url_for("admin_dashboard"))
 
+@app.route("/admin/maintenance/cleanup-reports/<job_id>")
+@login_required
+@roles_required("admin")
+def admin_report_cleanup_status(job_id):
+    """Progresso de uma limpeza de relatórios em background"""
+    job = _load_cleanup_job(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+def optimize_database(full=False):
+    """
+    Otimização do banco SQLite.
+    Padrão: PRAGMA optimize + incremental_vacuum + checkpoint do WAL (custo proporcional
+    ao que mudou, sem travar o arquivo inteiro). full=True reconstrói o arquivo com VACUUM.
+    """
+    if full:
+        # Na reconstrução o banco passa a usar auto-vacuum incremental (se ainda não usa)
+        db.session.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+        db.session.execute(text("VACUUM"))
+    else:
+        db.session.execute(text("PRAGMA optimize"))
+        # Estatísticas de system_activity atualizadas (a contagem de logs da manutenção vem daqui)
+        db.session.execute(text("PRAGMA analysis_limit=400"))
+        db.session.execute(text("ANALYZE system_activity"))
+        db.session.execute(text("PRAGMA incremental_vacuum(1000)"))
+    db.session.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    db.session.commit()
+
 @app.route("/admin/maintenance", methods=["GET", "POST"])
 @login_required
 @roles_required("admin")
@@ -1569,15 +2411,14 @@ def admin_maintenance():
         action = request.form.get("action")
         
         try:
-            if action == "optimize_db":
-                # Otimizar banco de dados
-                db.session.execute(text("VACUUM;"))
-                db.session.execute(text("REINDEX;"))
-                db.session.commit()
+            if action in ("optimize_db", "rebuild_db"):
+                # Otimizar banco de dados (reconstrução completa só quando pedida explicitamente)
+                full = action == "rebuild_db"
+                optimize_database(full=full)
                 
                 if activity_logger:
                     log_admin_action(current_user().id, current_user().username, 
-                                   "Otimização do banco de dados")
+                                   "Reconstrução completa do banco de dados" if full else "Otimização do banco de dados")
                 
                 flash("Banco de dados otimizado com sucesso!", "success")
                 
@@ -1593,24 +2434,10 @@ def admin_maintenance():
                     flash(f"Removidos {deleted} logs antigos (mais de {days} dias)!", "success")
                 
             elif action == "cleanup_reports":
-                # Limpar relatórios antigos
-                import glob
-                report_files = glob.glob(os.path.join(app.config["REPORT_DIR"], "*.png"))
-                report_files.extend(glob.glob(os.path.join(app.config["REPORT_DIR"], "*.pdf")))
-                
-                removed_count = 0
-                for file in report_files:
-                    try:
-                        os.remove(file)
-                        removed_count += 1
-                    except:
-                        pass
-                
-                if activity_logger:
-                    log_admin_action(current_user().id, current_user().username, 
-                                   f"Limpeza de relatórios - {removed_count} arquivos removidos")
-                
-                flash(f"Removidos {removed_count} arquivos de relatórios!", "success")
+                # Limpar relatórios antigos (em background; a página acompanha o progresso)
+                job_id = start_report_cleanup(current_user().id, current_user().username)
+                flash("Limpeza de relatórios iniciada.", "info")
+                return redirect(url_for("admin_maintenance", cleanup_job=job_id))
                 
             elif action == "backup_db":
                 # Criar backup manual
@@ -1633,49 +2460,72 @@ def admin_maintenance():
     # Obter informações do sistema
     try:
         # Informações do banco
-        db_size = os.path.getsize("sistema_os.db") / (1024 * 1024) if os.path.exists("sistema_os.db") else 0
+        # Um único stat (exists + getsize seriam dois)
+        try:
+            db_size = os.stat("sistema_os.db").st_size / (1024 * 1024)
+        except FileNotFoundError:
+            db_size = 0
         
         # Informações de logs
+        # Estimativa do ANALYZE (sqlite_stat1, leitura O(1)); COUNT(*) só se não houver estatística
         log_count = 0
+        log_count_approx = False
         if activity_logger:
-            conn = sqlite3.connect("sistema_os.db")
-            cursor = conn.cursor()
-            try:
-                cursor.execute("SELECT COUNT(*) FROM system_activity")
-                log_count = cursor.fetchone()[0]
-            except:
-                pass
-            conn.close()
+            with get_conn() as conn:
+                cursor = conn.cursor()
+                try:
+                    try:
+                        cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = 'system_activity' LIMIT 1")
+                        row = cursor.fetchone()
+                    except sqlite3.OperationalError:  # banco ainda sem ANALYZE
+                        row = None
+                    if row:
+                        log_count = int(row[0].split()[0])
+                        log_count_approx = True
+                    else:
+                        cursor.execute("SELECT COUNT(*) FROM system_activity")
+                        log_count = cursor.fetchone()[0]
+                except:
+                    pass
         
         # Informações de backups
+        # (os.scandir: um stat por arquivo, reaproveitado para ordenar, tamanho e data)
         backup_info = []
-        if os.path.exists("backups"):
-            import glob
-            backup_files = glob.glob("backups/*.db")
-            for backup in sorted(backup_files, key=os.path.getctime, reverse=True)[:5]:
-                backup_info.append({
-                    'name': os.path.basename(backup),
-                    'size': f"{os.path.getsize(backup) / (1024 * 1024):.2f} MB",
-                    'date': datetime.fromtimestamp(os.path.getctime(backup)).strftime('%d/%m/%Y %H:%M')
-                })
-        
-        # Informações de relatórios
+        try:
+            with os.scandir("backups") as it:
+                backups = [(entry.name, entry.stat()) for entry in it
+                           if entry.name.endswith(".db") and entry.is_file()]
+        except FileNotFoundError:
+            backups = []
+        backups.sort(key=lambda b: b[1].st_ctime, reverse=True)
+        for name, st in backups[:5]:
+            backup_info.append({
+                'name': name,
+                'size': f"{st.st_size / (1024 * 1024):.2f} MB",
+                'date': datetime.fromtimestamp(st.st_ctime).strftime('%d/%m/%Y %H:%M')
+            })
+        
+        # Informações de relatórios (contagem e tamanho na mesma passada)
         report_count = 0
         report_size = 0
-        if os.path.exists(app.config["REPORT_DIR"]):
-            import glob
-            report_files = glob.glob(os.path.join(app.config["REPORT_DIR"], "*"))
-            report_count = len(report_files)
-            for file in report_files:
-                try:
-                    report_size += os.path.getsize(file)
-                except:
-                    pass
-            report_size = report_size / (1024 * 1024)  # MB
+        try:
+            with os.scandir(app.config["REPORT_DIR"]) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    report_count += 1
+                    try:
+                        report_size += entry.stat().st_size
+                    except OSError:
+                        pass
+        except FileNotFoundError:
+            pass
+        report_size = report_size / (1024 * 1024)  # MB
         
         system_info = {
             'db_size': f"{db_size:.2f} MB",
             'log_count': log_count,
+            'log_count_approx': log_count_approx,
             'backup_count': len(backup_info),
             'report_count': report_count,
             'report_size': f"{report_size:.2f} MB",
@@ -1696,78 +2546,75 @@ def admin_maintenance():
                          system_info=system_info,
                          license_status=license_status)
 
+# Janela do cache das estatísticas de auditoria (segundos)
+AUDIT_STATS_TTL = 60
+
+# Contadores de segurança das últimas 24h (coberto por idx_activity_ts_type)
+_AUDIT_SECURITY_SQL = """
+    SELECT COALESCE(SUM(action_type = 'LOGIN'), 0),
+           COALESCE(SUM(action_type = 'ADMIN'), 0),
+           COUNT(DISTINCT user_id),
+           COUNT(DISTINCT ip_address)
+    FROM system_activity
+    WHERE timestamp > ?
+"""
+_AUDIT_ACTIONS_BY_TYPE_SQL = """
+    SELECT action_type, COUNT(*) FROM system_activity
+    WHERE timestamp > ?
+    GROUP BY action_type
+    ORDER BY COUNT(*) DESC
+"""
+
+@lru_cache(maxsize=1)
+def _audit_stats(bucket, version):
+    """
+    Estatísticas de segurança e de usuários da auditoria.
+    bucket = int(time.time() // AUDIT_STATS_TTL): muda a cada janela e descarta o valor anterior;
+    version = shared_version('audit_stats'): o botão de atualizar invalida todos os workers.
+    """
+    # Estatísticas de segurança
+    security_stats = {}
+    
+    if activity_logger:
+        # Últimas 24h: um único passe pelo intervalo de timestamp para os contadores.
+        # Limite no mesmo formato texto da coluna timestamp
+        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+        (security_stats['logins_24h'], security_stats['admin_actions'],
+         security_stats['active_users'], security_stats['unique_ips']) = \
+            activity_logger.query(_AUDIT_SECURITY_SQL, (yesterday,))[0]
+        
+        # Tentativas de login falharam (seria necessário implementar)
+        security_stats['failed_logins'] = 0
+        
+        # Ações por tipo nas últimas 24h
+        security_stats['actions_by_type'] = dict(activity_logger.query(_AUDIT_ACTIONS_BY_TYPE_SQL, (yesterday,)))
+    
+    # Informações de usuários
+    user_stats = {}
+    try:
+        result = db.session.execute(_COUNT_SQL['user']).fetchone()
+        user_stats['total_users'] = result[0] if result else 0
+        
+        result = db.session.execute(_COUNT_ADMIN_USERS_SQL).fetchone()
+        user_stats['admin_users'] = result[0] if result else 0
+        
+        # Usuários ativos (simplified - treating all users as active for performance)
+        # The 'active' column doesn't exist in current schema, so all users are considered active
+        user_stats['active_users'] = user_stats['total_users']
+    
+    except Exception as e:
+        user_stats = {'error': str(e)}
+    
+    return security_stats, user_stats
+
 @app.route("/admin/audit")
 @login_required
 @roles_required("admin")
 def admin_audit():
     """Página de auditoria e segurança"""
     try:
-        # Estatísticas de segurança
-        security_stats = {}
-        
-        if activity_logger:
-            conn = sqlite3.connect("sistema_os.db")
-            cursor = conn.cursor()
-            
-            # Logins nas últimas 24h
-            yesterday = datetime.now() - timedelta(days=1)
-            cursor.execute("""
-                SELECT COUNT(*) FROM system_activity 
-                WHERE action_type = 'LOGIN' AND timestamp > ?
-            """, (yesterday.strftime('%Y-%m-%d %H:%M:%S'),))
-            security_stats['logins_24h'] = cursor.fetchone()[0]
-            
-            # Tentativas de login falharam (seria necessário implementar)
-            security_stats['failed_logins'] = 0
-            
-            # Ações administrativas
-            cursor.execute("""
-                SELECT COUNT(*) FROM system_activity 
-                WHERE action_type = 'ADMIN' AND timestamp > ?
-            """, (yesterday.strftime('%Y-%m-%d %H:%M:%S'),))
-            security_stats['admin_actions'] = cursor.fetchone()[0]
-            
-            # Usuários únicos ativos
-            cursor.execute("""
-                SELECT COUNT(DISTINCT user_id) FROM system_activity 
-                WHERE timestamp > ?
-            """, (yesterday.strftime('%Y-%m-%d %H:%M:%S'),))
-            security_stats['active_users'] = cursor.fetchone()[0]
-            
-            # Ações por tipo nas últimas 24h
-            cursor.execute("""
-                SELECT action_type, COUNT(*) FROM system_activity 
-                WHERE timestamp > ?
-                GROUP BY action_type
-                ORDER BY COUNT(*) DESC
-            """, (yesterday.strftime('%Y-%m-%d %H:%M:%S'),))
-            
-            security_stats['actions_by_type'] = dict(cursor.fetchall())
-            
-            # IPs únicos nas últimas 24h
-            cursor.execute("""
-                SELECT COUNT(DISTINCT ip_address) FROM system_activity 
-                WHERE timestamp > ? AND ip_address IS NOT NULL
-            """, (yesterday.strftime('%Y-%m-%d %H:%M:%S'),))
-            security_stats['unique_ips'] = cursor.fetchone()[0]
-            
-            conn.close()
-        
-        # Informações de usuários
-        user_stats = {}
-        try:
-            result = db.session.execute(text("SELECT COUNT(*) FROM user")).fetchone()
-            user_stats['total_users'] = result[0] if result else 0
-            
-            result = db.session.execute(text("SELECT COUNT(*) FROM user WHERE role = 'admin'")).fetchone()
-            user_stats['admin_users'] = result[0] if result else 0
-            
-            # Usuários ativos (simplified - treating all users as active for performance)
-            # The 'active' column doesn't exist in current schema, so all users are considered active
-            user_stats['active_users'] = user_stats['total_users']
-                
-        except Exception as e:
-            user_stats = {'error': str(e)}
+        security_stats, user_stats = _audit_stats(int(time.time() // AUDIT_STATS_TTL),
+                                                  shared_version('audit_stats'))
         
         return render_template("admin/audit.html",
                              app_name=APP_NAME,
@@ -1779,6 +2626,14 @@ def admin_audit():
         flash(f"Erro ao carregar auditoria: {str(e)}", "danger")
         return redirect(url_for("admin_dashboard"))
 
+@app.route("/admin/audit/refresh", methods=["POST"])
+@login_required
+@roles_required("admin")
+def admin_audit_refresh():
+    """Descartar o cache (em todos os workers) e recalcular as estatísticas de auditoria"""
+    bump_shared_version('audit_stats')
+    return redirect(url_for("admin_audit"))
+
 # -------------------- LICENSE MANAGEMENT --------------------
 @app.route("/license")
 @app.route("/license/activation")
@@ -1852,10 +2707,10 @@ def license_renew():
 def license_status():
     """API para verificar status da licença"""
     if not license_manager:
-        return json.dumps({"licensed": False, "error": "Sistema não disponível"})
+        return jsonify({"licensed": False, "error": "Sistema não disponível"})
     
     status = get_license_status()
-    return json.dumps(status)
+    return jsonify(status)
 
 @app.route("/admin/license")
 @login_required
@@ -1983,8 +2838,7 @@ def admin_sistema():
         if action == "optimize_db":
             # Optimize database
             try:
-                db.session.execute(text("VACUUM;"))
-                db.session.commit()
+                optimize_database()
                 flash("Banco de dados otimizado com sucesso!", "success")
             except Exception as e:
                 flash(f"Erro ao otimizar banco: {str(e)}", "danger")
@@ -1992,17 +2846,8 @@ def admin_sistema():
         elif action == "clear_logs":
             # Clear old reports from static folder
             try:
-                import glob
-                report_files = glob.glob(os.path.join(app.config["REPORT_DIR"], "*.png"))
-                report_files.extend(glob.glob(os.path.join(app.config["REPORT_DIR"], "*.pdf")))
-                removed_count = 0
-                for file in report_files:
-                    try:
-                        os.remove(file)
-                        removed_count += 1
-                    except:
-                        pass
-                flash(f"Removidos {removed_count} arquivos de relatórios antigos!", "success")
+                start_report_cleanup(current_user().id, current_user().username)
+                flash("Limpeza dos arquivos de relatórios iniciada em segundo plano.", "success")
             except Exception as e:
                 flash(f"Erro ao limpar arquivos: {str(e)}", "danger")
         
@@ -2012,13 +2857,13 @@ def admin_sistema():
     stats = {}
     try:
         # Database stats
-        result = db.session.execute(text("SELECT COUNT(*) FROM chamado")).fetchone()
+        result = db.session.execute(_COUNT_SQL['chamado']).fetchone()
         stats['total_chamados'] = result[0] if result else 0
         
-        result = db.session.execute(text("SELECT COUNT(*) FROM user")).fetchone()
+        result = db.session.execute(_COUNT_SQL['user']).fetchone()
         stats['total_usuarios'] = result[0] if result else 0
         
-        result = db.session.execute(text("SELECT COUNT(*) FROM chamado WHERE status = 'aberto'")).fetchone()
+        result = db.session.execute(_COUNT_CHAMADOS_ABERTOS_SQL).fetchone()
         stats['chamados_abertos'] = result[0] if result else 0
         
         # Database file size
@@ -2026,8 +2871,8 @@ def admin_sistema():
         stats['db_size'] = f"{db_size:.2f} MB"
         
         # Report files count
-        import glob
-        report_files = len(glob.glob(os.path.join(app.config["REPORT_DIR"], "*")))
+        with os.scandir(app.config["REPORT_DIR"]) as it:
+            report_files = sum(1 for entry in it if not entry.name.startswith("."))
         stats['report_files'] = report_files
         
     except Exception as e:
@@ -2036,10 +2881,110 @@ def admin_sistema():
     return render_template("admin_sistema.html", stats=stats, app_name=APP_NAME, user=current_user())
 
 # -------------------- RELATÓRIOS --------------------
+# Duração do chamado em horas calculada no SQLite (NULL enquanto não fechado)
+CHAMADO_DURACAO_H = (db.func.julianday(Chamado.fechado_em) - db.func.julianday(Chamado.criado_em)) * 24
+
+# Linhas por página da tabela de chamados do relatório
+REPORT_TABLE_PAGE = 100
+# Linhas por bloco lidas do banco para o dataframe dos gráficos
+REPORT_CHART_CHUNK = 2000
+# Linhas por bloco lidas do banco na exportação em PDF
+PDF_EXPORT_CHUNK = 1000
+
+def _parse_report_date(value, end_of_day=False):
+    """Data YYYY-MM-DD do filtro de relatório (None se vazia/inválida)"""
+    try:
+        parsed = datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+    return parsed.replace(hour=23, minute=59, second=59) if end_of_day else parsed
+
+def filter_report_period(q, data_ini, data_fim):
+    """
+    Filtra os chamados pelo período de abertura. Com as duas datas vira um único
+    BETWEEN sobre criado_em (intervalo no idx_chamado_report).
+    """
+    di = _parse_report_date(data_ini)
+    df_ = _parse_report_date(data_fim, end_of_day=True)
+    if di and df_:
+        return q.filter(Chamado.criado_em.between(di, df_))
+    if di:
+        return q.filter(Chamado.criado_em >= di)
+    if df_:
+        return q.filter(Chamado.criado_em <= df_)
+    return q
+
+# Conjuntos de gráficos (um por hash de dados) mantidos em REPORT_DIR; os mais antigos
+# (pela data de modificação, renovada a cada reuso) são apagados quando um novo é gerado
+REPORT_CHART_KEEP = 50
+
+def _prune_report_charts(report_dir, keep):
+    """Apagar os PNGs de gráficos além dos `keep` hashes usados mais recentemente"""
+    try:
+        latest = {}
+        with os.scandir(report_dir) as it:
+            for entry in it:
+                key, sep, rest = entry.name.partition('_')
+                if sep and len(key) == 16 and rest.endswith('.png') and entry.is_file():
+                    mtime = entry.stat().st_mtime
+                    group = latest.setdefault(key, [0.0, []])
+                    group[0] = max(group[0], mtime)
+                    group[1].append(entry.name)
+        stale = sorted(latest.values(), key=lambda group: group[0], reverse=True)[keep:]
+        for _, names in stale:
+            for name in names:
+                with suppress(FileNotFoundError):
+                    os.unlink(os.path.join(report_dir, name))
+    except OSError as e:
+        print(f"⚠️ Erro ao podar gráficos de relatório: {e}")
+
+def render_report_charts(df, charts):
+    """
+    Gera os PNGs dos gráficos reaproveitando uma única Figure (canvas Agg, sem pyplot).
+    Os arquivos são nomeados pelo hash dos dados do relatório, então um relatório
+    com os mesmos dados reutiliza as imagens já geradas em vez de redesenhá-las.
+    Só os REPORT_CHART_KEEP conjuntos usados mais recentemente ficam em disco.
+    """
+    import pandas as pd
+    key = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()[:16]
+    fig = None
+    files = []
+    for suffix, series, kind, title, xlabel, ylabel, plot_kwargs in charts:
+        path = os.path.join(app.config["REPORT_DIR"], f"{key}_{suffix}.png")
+        if os.path.exists(path):
+            # Reuso renova a data: o conjunto conta como recente na poda
+            with suppress(OSError):
+                os.utime(path)
+        else:
+            if fig is None:
+                from matplotlib.figure import Figure
+                from matplotlib.backends.backend_agg import FigureCanvasAgg
+                fig = Figure()
+                FigureCanvasAgg(fig)
+            # clf + novo Axes: o gráfico de pizza desliga moldura/proporção do Axes anterior
+            fig.clf()
+            ax = fig.add_subplot(111)
+            series.plot(ax=ax, kind=kind, **plot_kwargs)
+            ax.set_title(title)
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            # Grava em arquivo temporário e renomeia: requisições simultâneas nunca
+            # servem um PNG pela metade
+            tmp_path = f"{path}.{uuid4_hex()}.tmp"
+            fig.savefig(tmp_path, format="png", bbox_inches="tight")
+            os.replace(tmp_path, path)
+        files.append(path)
+    if fig is not None:
+        # Novo conjunto gravado: poda em background
+        _file_executor.submit(_prune_report_charts, app.config["REPORT_DIR"], REPORT_CHART_KEEP)
+    return files
+
 @app.route("/relatorios", methods=["GET","POST"])
 @login_required
 @permission_required("view_reports")
 def relatorios():
+    # pandas/matplotlib só são carregados quando um relatório é gerado
+    import pandas as pd
     u = current_user()
     # filtros
     data_ini = request.values.get("data_ini","")
@@ -2050,58 +2995,27 @@ def relatorios():
     aberto_por = request.values.get("aberto_por","")
     urgencia = request.values.get("urgencia","")
 
-    # Optimize query with eager loading to prevent N+1 problems
-    q = Chamado.query.options(
-        joinedload(Chamado.usuario),
-        joinedload(Chamado.fechado_por)
-    )
+    # Consulta base só com os filtros; cada parte do relatório projeta apenas o que usa
+    q = Chamado.query
     if setor:
         # Suporte a dados legados: filtrar tanto por name interno quanto display_name
-        # para garantir compatibilidade com dados antigos
-        try:
-            sector_obj = Sector.query.filter(
-                (Sector.name == setor) | (Sector.display_name == setor)
-            ).first()
-            
-            if sector_obj:
-                # Filtrar por ambos os valores possíveis para máxima compatibilidade
-                q = q.filter(
-                    (Chamado.setor == sector_obj.name) | 
-                    (Chamado.setor == sector_obj.display_name)
-                )
-            else:
-                # Fallback: filtrar pelo valor exato selecionado
-                q = q.filter(Chamado.setor == setor)
-        except:
-            # Em caso de erro, usar filtro simples
-            q = q.filter(Chamado.setor == setor)
+        # (sem setor conhecido, filtra pelo valor exato selecionado)
+        aliases = get_sector_aliases().get(setor, (setor,))
+        q = q.filter(Chamado.setor.in_({alias for alias in aliases if alias}))
     if u.is_operator_like() and not u.is_admin():
-        user_sectors = u.get_sectors()
-        if user_sectors:
+        # Nomes em cache na sessão (get_sector_names) + mapa de apelidos em cache:
+        # nenhuma consulta de setores por relatório
+        user_sector_names = u.get_sector_names()
+        if user_sector_names:
             # Incluir compatibilidade com dados legados: tanto name quanto display_name
-            allowed_sector_values = []
-            for sector in user_sectors:
-                allowed_sector_values.append(sector.name)
-                allowed_sector_values.append(sector.display_name)
-            # Remover duplicados
-            allowed_sector_values = list(set(allowed_sector_values))
+            sector_aliases = get_sector_aliases()
+            allowed_sector_values = {alias for name in user_sector_names
+                                     for alias in sector_aliases.get(name, (name,)) if alias}
             q = q.filter(Chamado.setor.in_(allowed_sector_values))
         else:
             # Operator with no sectors sees no tickets
             q = q.filter(False)
-    if data_ini:
-        try:
-            di = datetime.strptime(data_ini, "%Y-%m-%d")
-            q = q.filter(Chamado.criado_em >= di)
-        except:
-            pass
-    if data_fim:
-        try:
-            df = datetime.strptime(data_fim, "%Y-%m-%d")
-            df = df.replace(hour=23, minute=59, second=59)
-            q = q.filter(Chamado.criado_em <= df)
-        except:
-            pass
+    q = filter_report_period(q, data_ini, data_fim)
     if status:
         q = q.filter(Chamado.status == status)
     if responsavel and responsavel.isdigit():
@@ -2111,139 +3025,112 @@ def relatorios():
     if urgencia:
         q = q.filter(Chamado.urgencia == urgencia)
 
-    chamados = q.order_by(Chamado.criado_em.asc()).all()
-
-    # dataframe
-    rows = []
-    for c in chamados:
-        duracao_h = None
-        if c.fechado_em:
-            duracao_h = (c.fechado_em - c.criado_em).total_seconds()/3600.0
-        rows.append({
-            "ID": c.id,
-            "Título": c.titulo,
-            "Status": c.status,
-            "Criado em": c.criado_em,
-            "Fechado em": c.fechado_em,
-            "Duração(h)": duracao_h,
-            "Aberto por": c.usuario.username if c.usuario else "",
-            "Fechado por": c.fechado_por.username if c.fechado_por else "",
-            "Setor": (c.setor or '—'),
-            "Setor do Solicitante": (c.usuario_setor or '—')
-        })
-    df = pd.DataFrame(rows)
+    # KPIs agregados no próprio SQLite (uma linha, sem transferir os chamados)
+    duracao_h = CHAMADO_DURACAO_H
+    total, total_abertas, total_fechadas, media_h, total_horas = q.with_entities(
+        db.func.count(Chamado.id),
+        db.func.coalesce(db.func.sum(case((Chamado.status == "Aberto", 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(case((Chamado.status == "Fechado", 1), else_=0)), 0),
+        db.func.avg(duracao_h),
+        db.func.coalesce(db.func.sum(duracao_h), 0),
+    ).one()
+
+    # Tabela: uma página por vez (cursor criado_em, id), com os nomes de usuário no SELECT
+    aberto_por_user = aliased(User)
+    fechado_por_user = aliased(User)
+    table_q = q.outerjoin(
+        aberto_por_user, Chamado.usuario_id == aberto_por_user.id
+    ).outerjoin(
+        fechado_por_user, Chamado.fechado_por_id == fechado_por_user.id
+    ).with_entities(
+        Chamado.id, Chamado.titulo, Chamado.status, Chamado.criado_em, Chamado.fechado_em,
+        db.func.coalesce(aberto_por_user.username, '').label('aberto_por'),
+        db.func.coalesce(fechado_por_user.username, '').label('fechado_por'),
+        db.func.coalesce(db.func.nullif(Chamado.setor, ''), '—').label('setor'),
+    )
+    # Mesma paginação por cursor da listagem ('before' = voltar uma página), em ordem crescente
+    before = request.args.get("before")
+    chamados, next_cursor, prev_cursor = paginate_keyset(
+        table_q, before or request.args.get("after"), REPORT_TABLE_PAGE, 'asc', backwards=bool(before)
+    )
+
+    # dataframe dos gráficos: só as colunas que eles usam; duração calculada de forma vetorizada
+    chart_stmt = q.outerjoin(
+        fechado_por_user, Chamado.fechado_por_id == fechado_por_user.id
+    ).with_entities(
+        Chamado.id, Chamado.status, Chamado.criado_em, Chamado.fechado_em,
+        db.func.coalesce(fechado_por_user.username, ''),
+    ).order_by(Chamado.criado_em.asc()).statement
+
+    def chart_frame(records):
+        frame = pd.DataFrame.from_records(records, columns=["ID", "Status", "Criado em", "Fechado em", "Fechado por"])
+        frame["Criado em"] = pd.to_datetime(frame["Criado em"])
+        frame["Fechado em"] = pd.to_datetime(frame["Fechado em"])
+        return frame
+
+    # Lido em blocos (yield_per): as datas viram datetime64 bloco a bloco, sem manter
+    # todas as linhas do filtro em objetos Python ao mesmo tempo
+    chunks = [chart_frame(part) for part in db.session.execute(
+        chart_stmt, execution_options={"yield_per": REPORT_CHART_CHUNK}
+    ).partitions()]
+    df = pd.concat(chunks, ignore_index=True) if chunks else chart_frame([])
+    del chunks
+    df["Duração(h)"] = (df["Fechado em"] - df["Criado em"]).dt.total_seconds() / 3600.0
 
     # gerar gráficos (salvos como PNG na pasta static/relatorios)
     chart_files = []
     if not df.empty:
-        # OS por mês
-        df["Mes"] = pd.to_datetime(df["Criado em"]).dt.to_period("M").astype(str)
-        qty_by_month = df.groupby("Mes")["ID"].count().sort_index()
-
-        fig1 = plt.figure()
-        qty_by_month.plot(kind="bar")
-        plt.title("Quantidade de OS por mês")
-        plt.xlabel("Mês")
-        plt.ylabel("Qtd de OS")
-        file1 = os.path.join(app.config["REPORT_DIR"], f"{uuid4_hex()}_qtd_mes.png")
-        fig1.savefig(file1, bbox_inches="tight")
-        plt.close(fig1)
-        chart_files.append(file1)
-
-        # Médias por mês (fechadas)
-        df_closed = df.dropna(subset=["Fechado em"]).copy()
+        # (sufixo do arquivo, série, tipo, título, eixo x, eixo y, opções do plot)
+        charts = []
+        
+        # OS por mês (agrupado pelo Period; convertido para texto só no eixo do gráfico)
+        qty_by_month = df.groupby(df["Criado em"].dt.to_period("M")).size()
+        qty_by_month.index = qty_by_month.index.astype(str)
+        charts.append(("qtd_mes", qty_by_month, "bar", "Quantidade de OS por mês", "Mês", "Qtd de OS", {}))
+
+        # Médias por mês (fechadas) - sem cópia, só a máscara das linhas fechadas
+        df_closed = df[df["Fechado em"].notna()]
         if not df_closed.empty:
-            df_closed["MesFech"] = pd.to_datetime(df_closed["Fechado em"]).dt.to_period("M").astype(str)
-            mean_by_month = df_closed.groupby("MesFech")["Duração(h)"].mean().sort_index()
-            fig2 = plt.figure()
-            mean_by_month.plot(kind="line", marker="o")
-            plt.title("Tempo médio de atendimento (h) por mês")
-            plt.xlabel("Mês")
-            plt.ylabel("Média (h)")
-            file2 = os.path.join(app.config["REPORT_DIR"], f"{uuid4_hex()}_media_mes.png")
-            fig2.savefig(file2, bbox_inches="tight")
-            plt.close(fig2)
-            chart_files.append(file2)
+            mean_by_month = df_closed.groupby(df_closed["Fechado em"].dt.to_period("M"))["Duração(h)"].mean()
+            mean_by_month.index = mean_by_month.index.astype(str)
+            charts.append(("media_mes", mean_by_month, "line", "Tempo médio de atendimento (h) por mês",
+                           "Mês", "Média (h)", {"marker": "o"}))
 
         # Distribuição por status
         by_status = df["Status"].value_counts()
-        fig3 = plt.figure()
-        by_status.plot(kind="pie", autopct="%1.1f%%")
-        plt.title("Distribuição por status")
-        plt.ylabel("")
-        file3 = os.path.join(app.config["REPORT_DIR"], f"{uuid4_hex()}_status.png")
-        fig3.savefig(file3, bbox_inches="tight")
-        plt.close(fig3)
-        chart_files.append(file3)
-
-        # OS por operador (fechou) - contagem
+        charts.append(("status", by_status, "pie", "Distribuição por status", "", "", {"autopct": "%1.1f%%"}))
+
         if not df_closed.empty:
-            by_op_count = df_closed["Fechado por"].value_counts()
-            fig5 = plt.figure()
-            by_op_count.plot(kind="bar")
-            plt.title("OS fechadas por operador")
-            plt.xlabel("Operador")
-            plt.ylabel("Qtd")
-            file5 = os.path.join(app.config["REPORT_DIR"], f"{uuid4_hex()}_qtd_operador.png")
-            fig5.savefig(file5, bbox_inches="tight")
-            plt.close(fig5)
-            chart_files.append(file5)
-
-            # Tempo total por operador
-            by_op_hours = df_closed.groupby("Fechado por")["Duração(h)"].sum().sort_values(ascending=False)
-            fig4 = plt.figure()
-            by_op_hours.plot(kind="bar")
-            plt.title("Tempo total por operador (h)")
-            plt.xlabel("Operador")
-            plt.ylabel("Horas")
-            file4 = os.path.join(app.config["REPORT_DIR"], f"{uuid4_hex()}_tempo_operador.png")
-            fig4.savefig(file4, bbox_inches="tight")
-            plt.close(fig4)
-            chart_files.append(file4)
-
-            # Top 5 OS mais demoradas
-            top5 = df_closed.sort_values("Duração(h)", ascending=False).head(5).set_index("ID")["Duração(h)"]
+            # Contagem e tempo total por operador (fechou) numa única passada do groupby
+            by_op = df_closed.groupby("Fechado por", sort=False)["Duração(h)"].agg(["count", "sum"])
+            by_op_count = by_op["count"].sort_values(ascending=False)
+            charts.append(("qtd_operador", by_op_count, "bar", "OS fechadas por operador", "Operador", "Qtd", {}))
+
+            by_op_hours = by_op["sum"].sort_values(ascending=False)
+            charts.append(("tempo_operador", by_op_hours, "bar", "Tempo total por operador (h)", "Operador", "Horas", {}))
+
+            # Top 5 OS mais demoradas (nlargest evita ordenar todas as linhas)
+            top5 = df_closed.nlargest(5, "Duração(h)").set_index("ID")["Duração(h)"]
             if not top5.empty:
-                fig6 = plt.figure()
-                top5.plot(kind="bar")
-                plt.title("Top 5 OS mais demoradas (h)")
-                plt.xlabel("OS")
-                plt.ylabel("Horas")
-                file6 = os.path.join(app.config["REPORT_DIR"], f"{uuid4_hex()}_top5.png")
-                fig6.savefig(file6, bbox_inches="tight")
-                plt.close(fig6)
-                chart_files.append(file6)
-
-    # listar operadores e usuários para filtros
-    operadores = User.query.filter(User.role.in_(["operador","admin"])).order_by(User.username).all()
-    usuarios = User.query.filter(User.role.in_(["usuario","operador","admin"])).order_by(User.username).all()
-    
-    # Buscar setores dinamicamente da tabela Sector
-    try:
-        setores_db = Sector.query.filter_by(active=True).order_by(Sector.display_name).all()
-        setores = [{'name': sector.name, 'display_name': sector.display_name} for sector in setores_db]
-    except:
-        # Fallback para setores padrão se a tabela não existir
-        setores = [
-            {'name': 'T.I', 'display_name': 'T.I'},
-            {'name': 'Manutenção', 'display_name': 'Manutenção'},
-            {'name': 'CCIH / SESMT / Manutenção de Ar condicionado', 'display_name': 'CCIH / SESMT / Manutenção de Ar condicionado'},
-            {'name': 'Telefonia e outros serviços', 'display_name': 'Telefonia e outros serviços'}
-        ]
+                charts.append(("top5", top5, "bar", "Top 5 OS mais demoradas (h)", "OS", "Horas", {}))
+        
+        chart_files = render_report_charts(df, charts)
+
+    # listar operadores, usuários e setores para filtros (em cache até a próxima alteração)
+    operadores, usuarios = get_report_user_options()
+    setores = get_active_sectors(_REPORT_SECTOR_FALLBACK)
 
-    # KPIs
-    total_abertas = int((df["Status"] == "Aberto").sum()) if not df.empty else 0
-    total_fechadas = int((df["Status"] == "Fechado").sum()) if not df.empty else 0
-    media_h = round(float(df["Duração(h)"].dropna().mean()), 2) if not df.empty and df["Duração(h)"].notna().any() else 0.0
-    mediana_h = round(float(df["Duração(h)"].dropna().median()), 2) if not df.empty and df["Duração(h)"].notna().any() else 0.0
-    taxa_fechamento = round((total_fechadas / (len(df) if not df.empty else 1)) * 100, 1) if not df.empty else 0.0
-    total_horas = round(float(df["Duração(h)"].dropna().sum()), 2) if not df.empty else 0.0
+    # KPIs (a mediana é a única calculada no pandas, sobre a coluna de duração já carregada)
+    media_h = round(float(media_h), 2) if media_h is not None else 0.0
+    mediana_h = round(float(df["Duração(h)"].dropna().median()), 2) if df["Duração(h)"].notna().any() else 0.0
+    taxa_fechamento = round((total_fechadas / total) * 100, 1) if total else 0.0
+    total_horas = round(float(total_horas), 2)
 
     return render_template(
         "relatorios.html",
         app_name=APP_NAME,
         user=u,
-        chamados=chamados,
+        chamados=chamados, next_cursor=next_cursor, prev_cursor=prev_cursor, total_chamados=total,
         data_ini=data_ini, data_fim=data_fim, status=status, responsavel=responsavel, aberto_por=aberto_por,
         setor=setor, urgencia=urgencia,
         operadores=operadores, usuarios=usuarios, setores=setores,
@@ -2253,7 +3140,8 @@ def relatorios():
     )
 
 # Exportações com filtros atuais
-def _filtered_dataframe(params):
+def _filtered_query(params):
+    """Consulta das exportações: filtros do relatório + só as colunas exportadas, em ordem de abertura"""
     data_ini = params.get("data_ini","")
     data_fim = params.get("data_fim","")
     status = params.get("status","")
@@ -2278,18 +3166,7 @@ def _filtered_dataframe(params):
     # Then apply additional filters
     if setor:
         q = q.filter(Chamado.setor == setor)
-    if data_ini:
-        try:
-            di = datetime.strptime(data_ini, "%Y-%m-%d")
-            q = q.filter(Chamado.criado_em >= di)
-        except:
-            pass
-    if data_fim:
-        try:
-            df_ = datetime.strptime(data_fim, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
-            q = q.filter(Chamado.criado_em <= df_)
-        except:
-            pass
+    q = filter_report_period(q, data_ini, data_fim)
     if status:
         q = q.filter(Chamado.status == status)
     if responsavel and str(responsavel).isdigit():
@@ -2299,26 +3176,32 @@ def _filtered_dataframe(params):
     if urgencia:
         q = q.filter(Chamado.urgencia == urgencia)
 
-    chamados = q.order_by(Chamado.criado_em.asc()).all()
-    rows = []
-    for c in chamados:
-        duracao_h = None
-        if c.fechado_em:
-            duracao_h = round((c.fechado_em - c.criado_em).total_seconds()/3600.0, 2)
-        rows.append([
-            c.id,
-            c.criado_em,
-            c.usuario.username if c.usuario else "",
-            c.setor or '—',
-            getattr(c, 'ramal', '') or "",
-            c.descricao,
-            c.status,
-            c.fechado_em if c.fechado_em else "",
-            c.fechado_por.username if c.fechado_por else "",
-            duracao_h,
-            getattr(c, 'cdc', '') or ""
-        ])
-    df = pd.DataFrame(rows, columns=["ID","Abertura","Aberto por","Setor","Ramal","Descrição","Status","Fechamento","Fechado por","Duração(h)","CDC"])
+    # Só as colunas exportadas, em tuplas (sem objetos ORM); Aberto por/Fechado por
+    # vêm no mesmo SELECT (LEFT JOIN) em vez de um lazy load por chamado
+    aberto_por_user = aliased(User)
+    fechado_por_user = aliased(User)
+    return q.outerjoin(
+        aberto_por_user, Chamado.usuario_id == aberto_por_user.id
+    ).outerjoin(
+        fechado_por_user, Chamado.fechado_por_id == fechado_por_user.id
+    ).with_entities(
+        Chamado.id,
+        Chamado.criado_em,
+        db.func.coalesce(aberto_por_user.username, '').label('aberto_por'),
+        db.func.coalesce(db.func.nullif(Chamado.setor, ''), '—').label('setor'),
+        db.func.coalesce(Chamado.ramal, '').label('ramal'),
+        Chamado.descricao,
+        Chamado.status,
+        Chamado.fechado_em,
+        db.func.coalesce(fechado_por_user.username, '').label('fechado_por'),
+        db.func.round(CHAMADO_DURACAO_H, 2).label('duracao_h'),
+        db.func.coalesce(Chamado.cdc, '').label('cdc'),
+    ).order_by(Chamado.criado_em.asc())
+
+def _filtered_dataframe(params):
+    import pandas as pd
+    rows = _filtered_query(params).all()
+    df = pd.DataFrame.from_records(rows, columns=["ID","Abertura","Aberto por","Setor","Ramal","Descrição","Status","Fechamento","Fechado por","Duração(h)","CDC"])
     
     # Handle NaT values for Excel export compatibility
     df['Abertura'] = pd.to_datetime(df['Abertura'])
@@ -2330,15 +3213,16 @@ def _filtered_dataframe(params):
 @login_required
 @permission_required("view_reports")
 def export_xlsx():
+    import xlsxwriter
     df = _filtered_dataframe(request.args)
     output = io.BytesIO()
     
     # Create Excel with professional formatting
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Relatório de OS", startrow=4)
-        
-        workbook = writer.book
-        worksheet = writer.sheets['Relatório de OS']
+    # Workbook direto (sem df.to_excel): cada célula é gravada uma única vez, em ordem de linha;
+    # constant_memory descarrega cada linha concluída em vez de manter a planilha toda na memória
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_urls': False})
+    try:
+        worksheet = workbook.add_worksheet("Relatório de OS")
         
         # Header format
         header_format = workbook.add_format({
@@ -2399,28 +3283,28 @@ def export_xlsx():
         for col_num, value in enumerate(df.columns.values):
             worksheet.write(4, col_num, value, header_format)
         
-        # Format data rows with proper date handling
-        for row_num in range(len(df)):
-            for col_num, col_name in enumerate(df.columns):
-                value = df.iloc[row_num, col_num]
-                
-                # Handle date columns specifically
-                if col_name in ['Abertura', 'Fechamento'] and pd.notna(value):
-                    format_to_use = date_format if row_num % 2 == 0 else date_alt_format
-                    worksheet.write_datetime(row_num + 5, col_num, value, format_to_use)
-                elif value is None or pd.isna(value):
-                    # Write empty string for None/NaN values
-                    format_to_use = alt_row_format if row_num % 2 == 1 else None
-                    worksheet.write(row_num + 5, col_num, "", format_to_use)
-                else:
-                    # Regular data with special handling for description column
-                    if col_name == 'Descrição':
-                        # Apply text wrap to description column with alternating backgrounds
-                        format_to_use = wrap_format if row_num % 2 == 0 else wrap_alt_format  
-                        worksheet.write(row_num + 5, col_num, value, format_to_use)
-                    else:
-                        format_to_use = alt_row_format if row_num % 2 == 1 else None
-                        worksheet.write(row_num + 5, col_num, value, format_to_use)
+        # Fundo alternado das linhas ímpares via set_row: vale para as células gravadas sem
+        # formato e para as vazias (que nem são gravadas). Só datas e descrição (text wrap)
+        # precisam de formato explícito por linha par/ímpar, montado uma vez aqui
+        date_cols = {df.columns.get_loc('Abertura'), df.columns.get_loc('Fechamento')}
+        desc_col = df.columns.get_loc('Descrição')
+        row_formats = [
+            [date_fmt if col in date_cols else wrap_fmt if col == desc_col else None
+             for col in range(len(df.columns))]
+            for date_fmt, wrap_fmt in ((date_format, wrap_format), (date_alt_format, wrap_alt_format))
+        ]
+        
+        # Valores (objetos Python) e máscara de vazios calculados de uma vez, sem df.iloc por célula
+        values = df.to_numpy(dtype=object)
+        missing = df.isna().to_numpy()
+        for row_num, (row_values, row_missing) in enumerate(zip(values, missing)):
+            excel_row = row_num + 5
+            if row_num % 2:
+                worksheet.set_row(excel_row, None, alt_row_format)
+            formats = row_formats[row_num % 2]
+            for col_num, value in enumerate(row_values):
+                if not row_missing[col_num]:
+                    worksheet.write(excel_row, col_num, value, formats[col_num])
         
         # Set proper column widths matching the new column order
         worksheet.set_column('A:A', 8)   # ID column - narrow
@@ -2434,27 +3318,31 @@ def export_xlsx():
         worksheet.set_column('I:I', 15)  # Fechado por column
         worksheet.set_column('J:J', 12)  # Duração(h) column
         worksheet.set_column('K:K', 10)  # CDC column
+    finally:
+        workbook.close()
     
     output.seek(0)
     return send_file(output, as_attachment=True, download_name=f"relatorio_os_{now_brazil().strftime('%Y%m%d_%H%M')}.xlsx", 
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', max_age=0)
 
 @app.route("/relatorios/export/csv")
 @login_required
 @permission_required("view_reports")
 def export_csv():
     df = _filtered_dataframe(request.args)
-    output = io.StringIO()
-    df.to_csv(output, index=False)
+    # Codificado direto no buffer binário (BOM para o Excel), sem StringIO + encode
+    output = io.BytesIO()
+    df.to_csv(output, index=False, encoding="utf-8-sig")
     output.seek(0)
-    return send_file(io.BytesIO(output.getvalue().encode("utf-8-sig")), as_attachment=True, 
-                     download_name="relatorio_os.csv", mimetype="text/csv")
+    return send_file(output, as_attachment=True, 
+                     download_name="relatorio_os.csv", mimetype="text/csv", max_age=0)
 
 @app.route("/export_pdf")
 @login_required
 @permission_required("view_reports")
 def export_pdf():
-    df = _filtered_dataframe(request.args)
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
     packet = io.BytesIO()
     c = canvas.Canvas(packet, pagesize=A4)
     width, height = A4
@@ -2491,8 +3379,11 @@ def export_pdf():
     # Table data
     c.setFont("Helvetica", 7)
     row_color = True
+    total_rows = 0
     
-    for _, row in df.iterrows():
+    # Linhas lidas do banco em blocos (yield_per) e desenhadas direto, sem montar DataFrame
+    for row in _filtered_query(request.args).yield_per(PDF_EXPORT_CHUNK):
+        total_rows += 1
         if y < 100:
             c.showPage()
             y = height - 50
@@ -2512,22 +3403,17 @@ def export_pdf():
         
         c.setFillColorRGB(0, 0, 0)  # Reset to black for text
         
-        # Handle optional columns safely
-        setor_solicitante = ""
-        if "Setor do Solicitante" in df.columns and pd.notna(row["Setor do Solicitante"]) and row["Setor do Solicitante"] != '—':
-            setor_solicitante = str(row["Setor do Solicitante"])[:8]
-        
         data = [
-            str(row["ID"]),
-            str(row["Descrição"])[:15],
-            str(row["Status"]),
-            str(row["Setor"])[:6] if row["Setor"] != '—' else "",
-            setor_solicitante,
-            row["Abertura"].strftime("%d/%m") if pd.notna(row["Abertura"]) else "",
-            row["Fechamento"].strftime("%d/%m") if pd.notna(row["Fechamento"]) else "",
-            f'{row["Duração(h)"]:.1f}' if pd.notna(row["Duração(h)"]) else "",
-            str(row["Aberto por"])[:8] if row["Aberto por"] else "",
-            str(row["Ramal"]) if row["Ramal"] else ""
+            str(row.id),
+            str(row.descricao)[:15],
+            str(row.status),
+            str(row.setor)[:6] if row.setor != '—' else "",
+            "",  # Set.Solic: a exportação não traz o setor do solicitante
+            row.criado_em.strftime("%d/%m") if row.criado_em else "",
+            row.fechado_em.strftime("%d/%m") if row.fechado_em else "",
+            f'{row.duracao_h:.1f}' if row.duracao_h is not None else "",
+            str(row.aberto_por)[:8] if row.aberto_por else "",
+            str(row.ramal) if row.ramal else ""
         ]
         
         for i, value in enumerate(data):
@@ -2538,26 +3424,47 @@ def export_pdf():
     
     # Footer
     c.setFont("Helvetica", 8)
-    c.drawCentredString(width/2, 30, f"Total de registros: {len(df)}")
+    c.drawCentredString(width/2, 30, f"Total de registros: {total_rows}")
     
     c.save()
     packet.seek(0)
     return send_file(packet, as_attachment=True, download_name=f"relatorio_os_{now_brazil().strftime('%Y%m%d_%H%M')}.pdf", 
-                     mimetype="application/pdf")
+                     mimetype="application/pdf", max_age=0)
 
 # util
 def uuid4_hex():
     return uuid.uuid4().hex
 
 # -------------------- WEBSOCKET HELPERS --------------------
+# Micro-batch de eventos de chamados: eventos em uma janela de 50ms saem em um único emit.
+# A fila é um dict por (id do chamado, tipo de evento): repetições dentro da janela
+# são coalescidas, mantendo a posição original e os dados mais recentes
+TICKET_EMIT_WINDOW = 0.05
+_pending_ticket_events = {}
+_pending_ticket_lock = threading.Lock()
+
+def _flush_ticket_updates():
+    socketio.sleep(TICKET_EMIT_WINDOW)
+    global _pending_ticket_events
+    with _pending_ticket_lock:
+        events, _pending_ticket_events = _pending_ticket_events, {}
+    if events:
+        socketio.emit('ticket_updates', {'events': list(events.values())}, namespace='/')
+
 def emit_ticket_update(ticket_data, event_type):
     """Emits ticket updates to clients with proper sector filtering"""
     # For now, emit to all clients - client-side filtering should handle sector restrictions
     # In a production environment, you'd want to track user sessions and filter server-side
-    socketio.emit('ticket_update', {
-        'event_type': event_type,
-        'ticket': ticket_data
-    }, namespace='/')
+    # O envio acontece em background (_flush_ticket_updates): a requisição só enfileira
+    with _pending_ticket_lock:
+        _pending_ticket_events[(ticket_data.get('id'), event_type)] = {
+            'event_type': event_type,
+            'ticket': ticket_data
+        }
+        schedule = len(_pending_ticket_events) == 1
+    # O primeiro evento da janela agenda o envio do lote
+    if schedule:
+        socketio.start_background_task(_flush_ticket_updates)
     
     # TODO: Implement server-side session tracking for sector-based filtering
     # This would require storing user sector info in socket sessions
@@ -2592,7 +3499,7 @@ def admin_dashboard():
     urgent_tickets = Chamado.query.filter_by(urgencia='Urgente').count() if hasattr(Chamado, 'urgencia') else 0
     
     # Recent activity (last 7 days)
-    seven_days_ago = now_brazil() - pd.Timedelta(days=7)
+    seven_days_ago = now_brazil() - timedelta(days=7)
     recent_tickets = Chamado.query.filter(Chamado.criado_em >= seven_days_ago).count()
     
     stats = {
@@ -2643,12 +3550,14 @@ def admin_sectors_new():
                 existing_sector.display_name = display_name
                 existing_sector.description = description
                 db.session.commit()
+                bump_sectors_version()
                 flash("Setor reativado com sucesso.", "success")
         else:
             # Create new sector
             sector = Sector(name=name, display_name=display_name, description=description)
             db.session.add(sector)
             db.session.commit()
+            bump_sectors_version()
             flash("Setor criado com sucesso.", "success")
         return redirect(url_for("admin_sectors"))
     
@@ -2680,6 +3589,7 @@ def admin_sectors_edit(sector_id):
         sector.display_name = display_name
         sector.description = description
         db.session.commit()
+        bump_sectors_version()
         flash("Setor atualizado com sucesso.", "success")
         return redirect(url_for("admin_sectors"))
     
@@ -2702,6 +3612,7 @@ def admin_sectors_delete(sector_id):
     
     sector.active = False  # Soft delete
     db.session.commit()
+    bump_sectors_version()
     flash("Setor removido com sucesso.", "success")
     return redirect(url_for("admin_sectors"))
 
@@ -2755,6 +3666,8 @@ def admin_users_new():
             sector_ids = [int(id) for id in sector_ids if id.isdigit()]
             user.assign_sectors(sector_ids)
             db.session.commit()
+        # Invalidar setores/usuários em cache (sessões e listas de filtros)
+        bump_sectors_version()
         
         # Validate operator sector assignment
         if role == 'operador' and not user.get_sectors():
@@ -2819,12 +3732,9 @@ def admin_users_editar(uid):
         if password:
             u.set_password(password)
         
-        # Force session refresh for currently logged in user
-        if u.id == session.get('user_id'):
-            session['user_sectors'] = u.get_sector_names()
-            session['user_role'] = u.role
-        
         db.session.commit()
+        # Invalidar setores cacheados nas sessões (deste e dos demais usuários)
+        bump_sectors_version()
         flash("Usuário atualizado com sucesso.", "success")
         return redirect(url_for("admin_users"))
     
@@ -2878,17 +3788,16 @@ def admin_roles_new():
                 return render_template("admin/role_form.html", app_name=APP_NAME, user=current_user())
             else:
                 # Reactivate the inactive role
-                import json
                 existing_role.active = True
                 existing_role.display_name = display_name
                 existing_role.description = description
                 existing_role.permissions = json.dumps(permissions)
                 db.session.commit()
+                bump_roles_version()
                 flash("Papel reativado com sucesso.", "success")
                 return redirect(url_for("admin_roles"))
         else:
             # Create new role
-            import json
             role = Role(
                 name=name, 
                 display_name=display_name, 
@@ -2897,6 +3806,7 @@ def admin_roles_new():
             )
             db.session.add(role)
         db.session.commit()
+        bump_roles_version()
         
         # Log activity
         if activity_logger:
@@ -2952,7 +3862,6 @@ def admin_roles_edit(role_id):
             flash("Já existe outro papel com este nome.", "danger")
             return redirect(url_for("admin_roles_edit", role_id=role_id))
         
-        import json
         role.name = name
         role.display_name = display_name
         role.description = description
@@ -2960,6 +3869,7 @@ def admin_roles_edit(role_id):
         role.updated_at = datetime.now()
         
         db.session.commit()
+        bump_roles_version()
         
         # Log activity
         if activity_logger:
@@ -3027,6 +3937,7 @@ def admin_roles_delete(role_id):
     # Soft delete - just mark as inactive
     role.active = False
     db.session.commit()
+    bump_roles_version()
     
     # Log activity
     if activity_logger:
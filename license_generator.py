@@ -10,8 +10,18 @@ import hashlib
 import json
 from datetime import datetime, timedelta
 import sqlite3
+from contextlib import closing
 from typing import Dict, List, Optional
 
+# Valores padrão de uma licença standard (create_license e bulk_create_licenses)
+DEFAULT_MAX_USERS = 50
+DEFAULT_MAX_TICKETS = 1000
+DEFAULT_PRICE = 200.0
+
+# Chaves por consulta de duplicidade em bulk_create_licenses: abaixo do limite de
+# variáveis por comando do SQLite (999 em versões antigas)
+KEY_CHECK_BATCH = 500
+
 class LicenseGenerator:
     def __init__(self, db_path: str = "sistema_os.db"):
         self.db_path = db_path
@@ -51,6 +61,17 @@ class LicenseGenerator:
     
     def generate_license_key(self, prefix: str = "OLIVION") -> str:
         """Gerar chave de licença única"""
+        license_key = self._random_key(prefix)
+        
+        # Verificar se já existe
+        if self._key_exists(license_key):
+            return self.generate_license_key(prefix)  # Recursão para gerar nova
+        
+        return license_key
+    
+    @staticmethod
+    def _random_key(prefix: str = "OLIVION") -> str:
+        """Montar chave aleatória sem consultar o banco"""
         # Formato: OLIVION-XXXX-XXXX-XXXX-XXXX
         segments = []
         
@@ -60,13 +81,7 @@ class LicenseGenerator:
                             for _ in range(4))
             segments.append(segment)
         
-        license_key = f"{prefix}-{'-'.join(segments)}"
-        
-        # Verificar se já existe
-        if self._key_exists(license_key):
-            return self.generate_license_key(prefix)  # Recursão para gerar nova
-        
-        return license_key
+        return f"{prefix}-{'-'.join(segments)}"
     
     def _key_exists(self, license_key: str) -> bool:
         """Verificar se chave já existe"""
@@ -87,9 +102,9 @@ class LicenseGenerator:
                       license_type: str = "standard",
                       customer_name: str = None,
                       customer_email: str = None,
-                      price: float = 200.0,
-                      max_users: int = 50,
-                      max_tickets: int = 1000,
+                      price: float = DEFAULT_PRICE,
+                      max_users: int = DEFAULT_MAX_USERS,
+                      max_tickets: int = DEFAULT_MAX_TICKETS,
                       notes: str = None) -> Dict:
         """Criar nova licença para venda"""
         
@@ -279,14 +294,46 @@ class LicenseGenerator:
     
     def bulk_create_licenses(self, count: int = 10, license_type: str = "standard") -> List[str]:
         """Criar várias licenças em lote"""
-        created_keys = []
+        if count <= 0:
+            return []
+        
+        features = json.dumps(self._get_features_by_type(license_type))
         
-        for _ in range(count):
-            result = self.create_license(license_type=license_type)
-            if result['success']:
-                created_keys.append(result['license_key'])
+        try:
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                cursor = conn.cursor()
+                
+                # Gerar todas as chaves antes de gravar: consultas de duplicidade em
+                # blocos de KEY_CHECK_BATCH e um único commit para o lote
+                keys = set()
+                while len(keys) < count:
+                    candidates = list({self._random_key() for _ in range(count - len(keys))} - keys)
+                    taken = set()
+                    for start in range(0, len(candidates), KEY_CHECK_BATCH):
+                        batch = candidates[start:start + KEY_CHECK_BATCH]
+                        placeholders = ",".join("?" * len(batch))
+                        cursor.execute(
+                            f"SELECT license_key FROM license_store WHERE license_key IN ({placeholders})",
+                            batch
+                        )
+                        taken.update(row[0] for row in cursor.fetchall())
+                    keys.update(key for key in candidates if key not in taken)
+                
+                created_keys = list(keys)
+                cursor.executemany('''
+                    INSERT INTO license_store
+                    (license_key, license_type, max_users, max_tickets, features, price)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [(key, license_type, DEFAULT_MAX_USERS, DEFAULT_MAX_TICKETS, features, DEFAULT_PRICE)
+                      for key in created_keys])
+                
+                conn.commit()
+            
+            return created_keys
         
-        return created_keys
+        except Exception as e:
+            print(f"Erro ao criar licenças em lote: {e}")
+            return []
     
     def get_license_info(self, license_key: str) -> Optional[Dict]:
         """Obter informações de uma licença específica"""
@@ -339,7 +386,7 @@ def create_standard_license(customer_name: str = None, customer_email: str = Non
         license_type="standard",
         customer_name=customer_name,
         customer_email=customer_email,
-        price=200.0
+        price=DEFAULT_PRICE
     )
     
     if result['success']:
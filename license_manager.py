@@ -12,14 +12,30 @@ from datetime import datetime, timedelta
 from cryptography.fernet import Fernet
 import uuid
 import os
+import time
+from functools import wraps
 from typing import Dict, Optional, Tuple
 
+def _invalidates_status(method):
+    """Métodos que alteram a licença: descartam o status em cache ao terminar"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.invalidate_status_cache()
+    return wrapper
+
 class LicenseManager:
+    # Segundos que o status da licença fica em cache (é consultado em toda requisição autenticada)
+    STATUS_CACHE_TTL = 30
+    
     def __init__(self, db_path: str = "sistema_os.db", validation_server: str = "https://license.olivion.com.br"):
         self.db_path = db_path
         self.validation_server = validation_server
         self.license_file = "license.dat"
         self.machine_id = self._get_machine_id()
+        self._status_cache = None  # (expira_em, status)
         self.setup_license_table()
     
     def setup_license_table(self):
@@ -74,6 +90,7 @@ class LicenseManager:
                     f.write(machine_id)
                 return machine_id
     
+    @_invalidates_status
     def activate_license(self, license_key: str, customer_name: str, customer_email: str) -> Tuple[bool, str]:
         """Ativar licença com validação remota"""
         try:
@@ -289,7 +306,20 @@ class LicenseManager:
             print(f"Erro ao salvar arquivo de licença: {e}")
     
     def check_license_status(self) -> Dict:
-        """Verificar status atual da licença"""
+        """Verificar status atual da licença (em cache por STATUS_CACHE_TTL segundos)"""
+        now = time.monotonic()
+        cached = self._status_cache
+        if cached is None or cached[0] <= now:
+            cached = self._status_cache = (now + self.STATUS_CACHE_TTL, self._check_license_status())
+        # Cópia: quem chama pode complementar o dict (ex.: get_license_info)
+        return dict(cached[1])
+    
+    def invalidate_status_cache(self):
+        """Descartar o status em cache (após ativar, renovar ou desativar)"""
+        self._status_cache = None
+    
+    def _check_license_status(self) -> Dict:
+        """Verificar status atual da licença no banco"""
         try:
             # Verificar banco de dados
             conn = sqlite3.connect(self.db_path)
@@ -372,6 +402,7 @@ class LicenseManager:
                 'days_remaining': 0
             }
     
+    @_invalidates_status
     def renew_license(self, license_key: str) -> Tuple[bool, str]:
         """Renovar licença existente"""
         try:
@@ -445,6 +476,7 @@ class LicenseManager:
                 'message': 'Falha na comunicação para renovação'
             }
     
+    @_invalidates_status
     def deactivate_license(self) -> bool:
         """Desativar licença atual"""
         try:
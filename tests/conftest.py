@@ -0,0 +1,70 @@
+# conftest.py - Fixtures dos testes de regressão (pytest)
+#
+# O app é importado dentro de um diretório temporário: o banco SQLAlchemy, o banco do
+# activity logger (instance/sistema_os.db relativo ao cwd), uploads e relatórios ficam
+# todos fora do repositório, sem tocar nos arquivos versionados.
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_WORKDIR = tempfile.mkdtemp(prefix="helpdesk-tests-")
+helpdesk = None
+
+
+def pytest_configure(config):
+    # Depois da coleta dos caminhos: o app cria arquivos relativos ao diretório atual
+    global helpdesk
+    os.makedirs(os.path.join(_WORKDIR, "instance"))
+    os.makedirs(os.path.join(_WORKDIR, "static", "uploads"))
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(_WORKDIR, 'test.db')}"
+    os.environ.pop("REDIS_URL", None)  # versões compartilhadas pela tabela cache_version
+    os.chdir(_WORKDIR)
+    sys.path.insert(0, ROOT)
+    import app
+    helpdesk = app
+
+
+def pytest_unconfigure(config):
+    os.chdir(ROOT)
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+def _clear_caches():
+    for cached in (helpdesk._get_custom_role, helpdesk._get_active_sectors_cached,
+                   helpdesk._get_sector_aliases_cached, helpdesk._get_report_user_options_cached,
+                   helpdesk._audit_stats):
+        cached.cache_clear()
+    helpdesk._local_versions.clear()
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """Módulo app com banco vazio (tabelas recriadas) e sem verificação de licença"""
+    monkeypatch.setattr(helpdesk, "license_manager", None)
+    helpdesk.app.config["TESTING"] = True
+    with helpdesk.app.app_context():
+        helpdesk.db.drop_all()
+        with helpdesk.db.engine.begin() as conn:
+            conn.execute(helpdesk.text("DROP TABLE IF EXISTS cache_version"))
+        helpdesk.db.create_all()
+        _clear_caches()
+        yield helpdesk
+        helpdesk.db.session.remove()
+    _clear_caches()
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def login_as(client, user_id):
+    """Sessão de teste já autenticada como o usuário informado"""
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess["user_id"] = user_id
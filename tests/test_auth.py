@@ -0,0 +1,60 @@
+# Senhas: hashes werkzeug antigos continuam válidos e são regravados em argon2 no login
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+pytest.importorskip("argon2")
+
+
+def _legacy_user(A, username='legado', password='senha-antiga'):
+    user = A.User(username=username, role='usuario', password_hash=generate_password_hash(password))
+    A.db.session.add(user)
+    A.db.session.commit()
+    return user
+
+
+def test_check_password_does_not_modify_the_hash(app_module):
+    A = app_module
+    user = _legacy_user(A)
+    legacy_hash = user.password_hash
+
+    assert user.check_password('senha-antiga')
+    assert not user.check_password('errada')
+    assert user.password_hash == legacy_hash
+    assert user not in A.db.session.dirty
+    assert user.needs_rehash()
+
+
+def test_set_password_uses_argon2(app_module):
+    A = app_module
+    user = A.User(username='novo', role='usuario')
+    user.set_password('segredo')
+    assert user.password_hash.startswith('$argon2')
+    assert user.check_password('segredo')
+    assert not user.check_password('outro')
+    assert not user.needs_rehash()
+
+
+def test_login_rehashes_legacy_password(app_module, client):
+    A = app_module
+    user_id = _legacy_user(A).id
+
+    response = client.post('/login', data={'username': 'legado', 'password': 'senha-antiga'})
+    assert response.status_code == 302
+
+    A.db.session.expire_all()
+    user = A.db.session.get(A.User, user_id)
+    assert user.password_hash.startswith('$argon2')
+    assert user.check_password('senha-antiga')
+
+
+def test_failed_login_keeps_legacy_hash(app_module, client):
+    A = app_module
+    user = _legacy_user(A)
+    legacy_hash = user.password_hash
+
+    response = client.post('/login', data={'username': 'legado', 'password': 'errada'})
+    assert response.status_code == 200
+
+    A.db.session.expire_all()
+    assert A.db.session.get(A.User, user.id).password_hash == legacy_hash
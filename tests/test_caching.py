@@ -0,0 +1,123 @@
+# Caches versionados de setores e papéis: a alteração feita por um worker precisa
+# invalidar o cache dos demais (versão compartilhada na tabela cache_version)
+
+import json
+
+from flask import g, session
+
+
+def _sector(A, name, display_name=None, active=True):
+    sector = A.Sector(name=name, display_name=display_name or name.upper(), active=active)
+    A.db.session.add(sector)
+    A.db.session.commit()
+    return sector
+
+
+def _other_worker_bump(A, name):
+    """Incremento feito por outro processo: direto no banco, sem passar pelo estado local"""
+    with A.db.engine.begin() as conn:
+        conn.execute(A._CACHE_VERSION_DDL)
+        conn.execute(A.text("""
+            INSERT INTO cache_version (name, version) VALUES (:name, 1)
+            ON CONFLICT(name) DO UPDATE SET version = version + 1
+        """), {'name': name})
+
+
+def test_shared_version_starts_at_zero_and_persists(app_module):
+    A = app_module
+    assert A.sectors_version() == 0  # tabela cache_version ainda não existe
+    A.bump_sectors_version()
+    A.bump_sectors_version()
+    A._local_versions.clear()  # outro worker não tem o contador local
+    assert A.sectors_version() == 2
+
+
+def test_shared_version_is_read_once_per_request(app_module):
+    A = app_module
+    with A.app.test_request_context():
+        assert A.sectors_version() == 0
+        _other_worker_bump(A, 'sectors_version')
+        assert A.sectors_version() == 0  # memorizada em g até o fim da requisição
+        A.bump_sectors_version()  # bump local descarta o valor memorizado
+        assert A.sectors_version() == 2
+    with A.app.test_request_context():
+        assert A.sectors_version() == 2
+
+
+def test_active_sectors_invalidated_by_other_worker(app_module):
+    A = app_module
+    _sector(A, 'ti', 'T.I')
+    assert [s.name for s in A.get_active_sectors()] == ['ti']
+
+    # Setor criado por outro worker: o cache continua válido até a versão mudar
+    A.db.session.add(A.Sector(name='rh', display_name='RH'))
+    A.db.session.commit()
+    assert [s.name for s in A.get_active_sectors()] == ['ti']
+
+    _other_worker_bump(A, 'sectors_version')
+    assert [s.name for s in A.get_active_sectors()] == ['rh', 'ti']
+    assert set(A.get_sector_aliases()) == {'ti', 'T.I', 'rh', 'RH'}
+
+
+def test_session_sector_names_refresh_after_bump(app_module):
+    A = app_module
+    ti = _sector(A, 'ti', 'T.I')
+    rh = _sector(A, 'rh', 'RH')
+    user = A.User(username='operador1', role='operador')
+    user.set_password('senha')
+    user.assign_sectors([ti.id])
+    A.db.session.add(user)
+    A.db.session.commit()
+
+    with A.app.test_request_context():
+        session['user_id'] = user.id
+        assert user.get_sector_names() == ['ti']
+        assert session['sector_names'] == ['ti']
+
+        user.assign_sectors([ti.id, rh.id])
+        A.db.session.commit()
+        # Mesma versão: a sessão ainda responde com o valor guardado
+        assert user.get_sector_names() == ['ti']
+        assert not user.has_sector_access('rh')
+
+        A.bump_sectors_version()
+        assert sorted(user.get_sector_names()) == ['rh', 'ti']
+        assert user.has_sector_access('rh')
+        assert session['sectors_version'] == A.sectors_version()
+
+
+def test_custom_role_permissions_follow_roles_version(app_module):
+    A = app_module
+    role = A.Role(name='compras', display_name='Compras',
+                  permissions=json.dumps(['view_reports', 'create_tickets']))
+    user = A.User(username='comprador', role='compras')
+    user.set_password('senha')
+    A.db.session.add_all([role, user])
+    A.db.session.commit()
+
+    assert user.has_permission('view_reports')
+    assert not user.has_permission('manage_users')
+
+    role.permissions = json.dumps(['create_tickets'])
+    A.db.session.commit()
+    assert user.has_permission('view_reports')  # ainda em cache
+
+    A.bump_roles_version()
+    assert not user.has_permission('view_reports')
+    assert user.has_permission('create_tickets')
+
+    role.active = False
+    A.db.session.commit()
+    A.bump_roles_version()
+    # Papel inativo: cai nas permissões legadas (nenhuma para um papel desconhecido)
+    assert not user.has_permission('create_tickets')
+
+
+def test_roles_version_is_read_once_per_request(app_module):
+    A = app_module
+    with A.app.test_request_context():
+        before = A.roles_version()
+        assert g._roles_version == before
+        A.bump_roles_version()
+        assert '_roles_version' not in g
+        assert A.roles_version() != before
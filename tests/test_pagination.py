@@ -0,0 +1,77 @@
+# Paginação por cursor (keyset) da listagem de chamados, incluindo chamados
+# legados com criado_em NULL
+
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def chamados(app_module):
+    A = app_module
+    base = datetime(2025, 1, 1, 8, 0)
+    rows = []
+    for i in range(7):
+        # Dois chamados com o mesmo criado_em (desempate por id) e dois sem data
+        criado_em = None if i in (2, 5) else base + timedelta(hours=min(i, 3))
+        rows.append(A.Chamado(titulo=f"Chamado {i}", descricao="teste", criado_em=criado_em))
+    A.db.session.add_all(rows)
+    A.db.session.commit()
+    # default=now_brazil preenche criado_em None; gravar NULL como nos bancos legados
+    A.db.session.execute(A.text("UPDATE chamado SET criado_em = NULL WHERE titulo IN ('Chamado 2', 'Chamado 5')"))
+    A.db.session.commit()
+    A.db.session.expire_all()
+    return A.Chamado.query.all()
+
+
+def _expected(chamados, sort_order):
+    dated = sorted((c for c in chamados if c.criado_em), key=lambda c: (c.criado_em, c.id))
+    legacy = sorted((c for c in chamados if not c.criado_em), key=lambda c: c.id)
+    if sort_order == 'desc':
+        return [c.id for c in reversed(dated)] + [c.id for c in reversed(legacy)]
+    return [c.id for c in legacy] + [c.id for c in dated]
+
+
+def _walk(A, sort_order, per_page):
+    """Percorre todas as páginas para frente e depois volta pelo link "Anterior" """
+    query = A.Chamado.query
+    pages, cursor = [], None
+    while True:
+        items, next_cursor, prev_cursor = A.paginate_keyset(query, cursor, per_page, sort_order)
+        pages.append([c.id for c in items])
+        assert (prev_cursor is None) == (cursor is None)
+        if not next_cursor:
+            break
+        cursor = next_cursor
+
+    back = [pages[-1]]
+    items, _, prev_cursor = A.paginate_keyset(query, cursor, per_page, sort_order)
+    while prev_cursor:
+        items, next_cursor, prev_cursor = A.paginate_keyset(query, prev_cursor, per_page, sort_order,
+                                                            backwards=True)
+        assert next_cursor is not None
+        back.append([c.id for c in items])
+    return pages, list(reversed(back))
+
+
+@pytest.mark.parametrize('sort_order', ['desc', 'asc'])
+@pytest.mark.parametrize('per_page', [1, 2, 3, 10])
+def test_keyset_pages_cover_every_ticket_once(app_module, chamados, sort_order, per_page):
+    pages, back = _walk(app_module, sort_order, per_page)
+    assert [cid for page in pages for cid in page] == _expected(chamados, sort_order)
+    assert all(len(page) == per_page for page in pages[:-1])
+    assert back == pages
+
+
+def test_cursor_round_trip(app_module, chamados):
+    A = app_module
+    for chamado in chamados:
+        assert A.decode_cursor(A.encode_cursor(chamado)) == (chamado.criado_em, chamado.id)
+
+
+@pytest.mark.parametrize('cursor', [None, '', 'inválido', 'bm9wZQ=='])
+def test_invalid_cursor_starts_from_first_page(app_module, chamados, cursor):
+    A = app_module
+    items, _, prev_cursor = A.paginate_keyset(A.Chamado.query, cursor, 3, 'desc')
+    assert [c.id for c in items] == _expected(chamados, 'desc')[:3]
+    assert prev_cursor is None